@@ -1,11 +1,35 @@
 # -*- coding: utf-8 -*-
 
-import transaction
+import argparse
+
 from bika.lims import api
 from bes.lims import logger
 from bes.lims.scripts import setup_script_environment
+from bes.lims.scripts.delete import bulk_delete
 from senaite.core.catalog import SAMPLE_CATALOG
-from senaite.core.upgrade.utils import delete_object
+
+
+__doc__ = """
+Deletes the dispatched samples that are not assigned to worksheets,
+committing in batches
+"""
+
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument(
+    "-n", "--dry_run", action="store_true",
+    help="Only count the samples to delete"
+)
+parser.add_argument(
+    "-b", "--batch_size",
+    help="Number of samples to delete before each commit. Default: 100",
+    default="100"
+)
+parser.add_argument(
+    "--checkpoint",
+    help="Checkpoint file to resume from, if interrupted"
+)
 
 
 def assigned_to_worksheets(sample):
@@ -23,6 +47,8 @@ def assigned_to_worksheets(sample):
 
 
 def main(app):
+    args, _ = parser.parse_known_args()
+
     # Setup environment
     setup_script_environment(app, stream_out=False)
 
@@ -31,31 +57,21 @@ def main(app):
         "review_state": "dispatched",
     }
 
-    brains = api.search(query, SAMPLE_CATALOG)
-    total = len(brains)
-    logger.info("Deleting %s dispatched samples ..." % total)
-    for brain in brains:
-        try:
-            sample = brain.getObject()
-        except AttributeError:
-            # the object associated to the brain was removed already
-            continue
-
+    def skip(sample):
         # is assigned to a worksheet?
         if assigned_to_worksheets(sample):
             sid = api.get_id(sample)
             logger.warn("[SKIP] Sample %s is assigned to a Worksheet" % sid)
-            sample._p_deactivate()
-            continue
-
-        # delete the sample
-        logger.info("Deleting %r ..." % sample)
-        delete_object(sample)
+            return True
+        return False
 
-    # Commit transaction
-    logger.info("Commit transaction ...")
-    transaction.commit()
-    logger.info("Deleting %s dispatched samples [DONE]" % total)
+    logger.info("Deleting dispatched samples ...")
+    deleted = bulk_delete(query, SAMPLE_CATALOG,
+                          batch_size=api.to_int(args.batch_size, 100),
+                          dry_run=args.dry_run,
+                          checkpoint_path=args.checkpoint,
+                          skip=skip)
+    logger.info("Deleting %s dispatched samples [DONE]" % deleted)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,39 @@
 # -*- coding: utf-8 -*-
 
-import transaction
+import argparse
+
 from bika.lims import api
 from bes.lims import logger
 from bes.lims.scripts import setup_script_environment
-from senaite.core.upgrade.utils import delete_object
+from bes.lims.scripts.delete import bulk_delete
 from senaite.patient.catalog import PATIENT_CATALOG
 
 
+__doc__ = """
+Deletes the inactive patients, committing in batches
+"""
+
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument(
+    "-n", "--dry_run", action="store_true",
+    help="Only count the patients to delete"
+)
+parser.add_argument(
+    "-b", "--batch_size",
+    help="Number of patients to delete before each commit. Default: 100",
+    default="100"
+)
+parser.add_argument(
+    "--checkpoint",
+    help="Checkpoint file to resume from, if interrupted"
+)
+
+
 def main(app):
+    args, _ = parser.parse_known_args()
+
     # Setup environment
     setup_script_environment(app, stream_out=False)
 
@@ -17,24 +42,12 @@ def main(app):
         "review_state": "inactive",
     }
 
-    brains = api.search(query, PATIENT_CATALOG)
-    total = len(brains)
-    logger.info("Deleting %s inactive patients ..." % total)
-    for brain in brains:
-        try:
-            patient = brain.getObject()
-        except AttributeError:
-            # the object associated to the brain was removed already
-            continue
-
-        # delete the patient
-        logger.info("Deleting %r ..." % patient)
-        delete_object(patient)
-
-    # Commit transaction
-    logger.info("Commit transaction ...")
-    transaction.commit()
-    logger.info("Deleting %s inactive patients [DONE]" % total)
+    logger.info("Deleting inactive patients ...")
+    deleted = bulk_delete(query, PATIENT_CATALOG,
+                          batch_size=api.to_int(args.batch_size, 100),
+                          dry_run=args.dry_run,
+                          checkpoint_path=args.checkpoint)
+    logger.info("Deleting %s inactive patients [DONE]" % deleted)
 
 
 if __name__ == "__main__":
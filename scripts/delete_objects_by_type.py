@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 
+import argparse
+
 import transaction
 from bika.lims import api
 from bes.lims import logger
 from bes.lims.scripts import setup_script_environment
-from bes.lims.scripts.utils import clear_and_rebuild
+from bes.lims.scripts.delete import bulk_delete
 from senaite.core.interfaces import INumberGenerator
-from senaite.core.upgrade.utils import delete_object
 from zope.component import getUtility
 
+__doc__ = """
+Deletes all the objects of the types below and resets the ID server for
+them. Objects are found through the catalogs and deleted in batches, along
+with the catalog entries of their contents
+"""
+
 TYPES_TO_DELETE = [
     "Worksheet",
     "ARReport",
@@ -19,34 +26,45 @@ TYPES_TO_DELETE = [
     "Patient",
 ]
 
-CATALOGS_TO_CLEAR_AND_REBUILD = [
-    "senaite_catalog",
-    "senaite_catalog_analysis",
-    "senaite_catalog_patient",
-    "senaite_catalog_report",
-    "senaite_catalog_sample",
-    "senaite_catalog_setup",
-    "senaite_catalog_worksheet",
-    "portal_catalog",
-    "uid_catalog",
-    "reference_catalog"
-]
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
 
+parser.add_argument(
+    "-n", "--dry_run", action="store_true",
+    help="Only count the objects to delete"
+)
+parser.add_argument(
+    "-b", "--batch_size",
+    help="Number of objects to delete before each commit. Default: 100",
+    default="100"
+)
 
-def delete_objects():
+
+def delete_objects(batch_size=100, dry_run=False):
     logger.info("Deleting objects by type ...")
     deleted = 0
-    portal = api.get_portal()
     for portal_type in TYPES_TO_DELETE:
 
         # Delete objects
-        deleted += delete_from(portal, portal_type)
+        deleted += delete_by_type(portal_type, batch_size=batch_size,
+                                  dry_run=dry_run)
 
     logger.info("Success: {} objects deleted".format(deleted))
     logger.info("Deleting objects by type [DONE]")
     return deleted
 
 
+def delete_by_type(portal_type, batch_size=100, dry_run=False):
+    """Deletes the objects of the given type found in the catalog the type
+    is mapped to, along with the catalog entries of their contents
+    """
+    logger.info("Deleting {} ...".format(portal_type))
+    catalog = api.get_catalogs_for(portal_type)[0]
+    query = {"portal_type": portal_type}
+    return bulk_delete(query, catalog.getId(), batch_size=batch_size,
+                       dry_run=dry_run)
+
+
 def reset_idserver():
     logger.info("Reset ID Server for deleted types ...")
     for portal_type in TYPES_TO_DELETE:
@@ -61,36 +79,21 @@ def reset_idserver():
     logger.info("Reset ID Server for deleted types [DONE]")
 
 
-def delete_from(folder, portal_type):
-    deleted = 0
-    for obj in folder.objectValues():
-        if not api.is_object(obj):
-            continue
-
-        if api.get_portal_type(obj) == portal_type:
-            path = api.get_path(obj)
-            logger.info("Deleting {}".format(path))
-            delete_object(obj)
-            deleted += 1
-            continue
-
-        deleted += delete_from(obj, portal_type)
-    return deleted
-
-
 def main(app):
+    args, _ = parser.parse_known_args()
+
     # Setup environment
     setup_script_environment(app)
 
-    # Delete objects
-    delete_objects()
+    # Delete objects, committed in batches
+    batch_size = api.to_int(args.batch_size, 100)
+    delete_objects(batch_size=batch_size, dry_run=args.dry_run)
+    if args.dry_run:
+        return
 
     # Reset ID Server
     reset_idserver()
 
-    # Clear and rebuild catalogs
-    clear_and_rebuild(CATALOGS_TO_CLEAR_AND_REBUILD)
-
     # Commit transaction
     logger.info("Commit transaction ...")
     transaction.commit()
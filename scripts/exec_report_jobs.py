@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+
+import transaction
+from bes.lims import logger
+from bes.lims.reports import jobs
+from bes.lims.scripts import setup_script_environment
+
+
+__doc__ = """
+Generates the statistic reports that were requested for generation in
+background and removes the results of the expired ones
+"""
+
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument(
+    "-m", "--max_jobs",
+    help="Maximum jobs to be processed",
+    default="5"
+)
+parser.add_argument(
+    "-su", "--senaite_user",
+    help="SENAITE user",
+    default="admin"
+)
+parser.add_argument(
+    "-v", "--verbose", action="store_true",
+    help="Verbose logging"
+)
+
+
+def main(app):
+    args, _ = parser.parse_known_args()
+    if hasattr(args, "help") and args.help:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    username = args.senaite_user
+    if not username:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    # verbose logging
+    log_mode = logging.DEBUG if args.verbose else logging.INFO
+    logger.setLevel(log_mode)
+
+    # Setup environment
+    setup_script_environment(app, username=username, logger=logger)
+
+    # do the work
+    logger.info("-" * 79)
+    logger.info("Executing report jobs ...")
+
+    # remove expired jobs first
+    jobs.purge()
+    transaction.commit()
+
+    # max number of jobs to process
+    max_jobs = int(args.max_jobs)
+    for num in range(0, max_jobs):
+        job = jobs.get_next()
+        if not job:
+            break
+
+        logger.info("Report job %s: %s ..." % (job["job_id"],
+                                                job["report_id"]))
+        jobs.process(job)
+
+    logger.info("Executing report jobs [DONE]")
+    logger.info("-" * 79)
+
+
+if __name__ == "__main__":
+    main(app)  # noqa: F821
@@ -20,26 +20,32 @@
 
 
 import argparse
+import json
 import logging
 import os
-import re
+import shutil
+import subprocess
+import sys
+import tempfile
 from collections import OrderedDict
 from datetime import timedelta
 
 from bes.lims import logger
 from bes.lims import messageFactory as _
+from bes.lims.reports.loader import iter_samples
+from bes.lims.reports.rows import AnalysisRowBuilder
+from bes.lims.reports.writers import CATEGORY
+from bes.lims.reports.writers import DATETIME
+from bes.lims.reports.writers import get_typed_writer_class
+from bes.lims.reports.writers import NUMBER
+from bes.lims.reports.writers import TEXT
 from bes.lims.scripts import setup_script_environment
-from bes.lims.utils import is_reportable
+from bes.lims.utils import get_analysis_date_changed
+from bes.lims.utils import ReportableEvaluator
 from bika.lims import api
-from bika.lims.utils import format_supsub
-from bika.lims.utils import to_utf8
-from bika.lims.utils.analysis import format_interim
 from senaite.core.api import dtime
 from senaite.core.catalog import ANALYSIS_CATALOG
-from senaite.core.i18n import translate
-from senaite.patient.api import get_age_ymd
-from senaite.patient.config import SEXES
-from six import StringIO
+from six import string_types
 
 
 __doc__ = """
@@ -53,6 +59,14 @@ they don't have verified or published dates).
 
 If no date range is provided, the system defaults to the previous week
 (Monday through Sunday).
+
+With --changes, only the analyses created or changed since the last run
+are exported, along with their UID as the key for upserts downstream. The
+date of the last run is kept in a file inside the destination directory.
+
+Rows are written to the file as they are generated. With more than one
+worker, the date range is split in chunks that are exported in parallel by
+separate processes (each one a client of the database) and merged in order.
 """
 
 parser = argparse.ArgumentParser(description=__doc__,
@@ -76,69 +90,159 @@ parser.add_argument(
     help='Destination directory for the CSV file',
 )
 
+parser.add_argument(
+    "-o", "--output_format",
+    help="Format of the output: csv (all values quoted) or typed (Parquet "
+         "if pyarrow is installed, gzip-compressed CSV otherwise, with dates "
+         "in ISO format and ages as numbers). Default: csv",
+    choices=["csv", "typed"],
+    default="csv"
+)
+
+parser.add_argument(
+    "--changes", action="store_true",
+    help="Export only the analyses created or changed since the last export "
+         "of changes to the destination directory, with their UID as the "
+         "upsert key. The date from, when set explicitly, is used instead of "
+         "the date of the last export. Changes of the samples count as "
+         "changes of their analyses"
+)
+
+parser.add_argument(
+    "-w", "--workers",
+    help="Number of worker processes (separate database clients) that "
+         "export the data in parallel. Default: 1",
+    default="1"
+)
+
+parser.add_argument(
+    "-c", "--chunk_days",
+    help="Number of days of the date range exported by each worker process. "
+         "Default: 1",
+    default="1"
+)
+
+parser.add_argument(
+    "-i", "--instance",
+    help="Instance script used to start the worker processes. Default: "
+         "bin/instance",
+    default="bin/instance"
+)
+
+parser.add_argument(
+    "--kind",
+    help=argparse.SUPPRESS
+)
+
+parser.add_argument(
+    "--part",
+    help=argparse.SUPPRESS
+)
+
 parser.add_argument(
     "-v", "--verbose", action="store_true",
     help="Verbose logging"
 )
 
+# Kinds of analyses to export, in order
+KINDS = ("published", "out_of_stock")
+
+# Name of the file that keeps the date of the last export of changes
+CHANGES_STATE_FILENAME = ".analyses-changes.json"
+
 # Define the columns
 COLUMNS = OrderedDict((
     ("sample_id", {
         "title": _("Sample ID"),
+        "type": TEXT,
     }),
     ("tamanu_id", {
         "title": _("Tamanu ID"),
+        "type": TEXT,
     }),
     ("sample_type", {
         "title": _("Sample Type"),
+        "type": CATEGORY,
     }),
     ("age", {
         "title": _("Patient Age"),
+        "type": NUMBER,
+        # typed outputs get the age in years
+        "typed_key": "age_years",
     }),
     ("gender", {
         "title": _("Patient Gender"),
+        "type": CATEGORY,
     }),
     ("collected", {
         "title": _("Date and time Collected"),
+        "type": DATETIME,
     }),
     ("created", {
         "title": _("Date and time Registered"),
+        "type": DATETIME,
     }),
     ("captured", {
         "title": _("Date and time Tested"),
+        "type": DATETIME,
     }),
     ("verified", {
         "title": _("Date and time Verified"),
+        "type": DATETIME,
     }),
     ("published", {
         "title": _("Date and time Published"),
+        "type": DATETIME,
     }),
     ("category", {
         "title": _("Test Category"),
+        "type": CATEGORY,
     }),
     ("department", {
         "title": _("Test Department"),
+        "type": CATEGORY,
     }),
     ("test_id", {
         "title": _("Test ID"),
+        "type": TEXT,
     }),
     ("test_type", {
         "title": _("Test Type"),
+        "type": TEXT,
     }),
     ("panels", {
         "title": _("Test Panels"),
+        "type": TEXT,
     }),
     ("result_variables", {
         "title": _("Result variables"),
+        "type": TEXT,
     }),
     ("result", {
         "title": _("Test Result (with units)"),
+        "type": TEXT,
     }),
     ("status", {
         "title": _("Test Status"),
+        "type": CATEGORY,
     }),
     ("site", {
         "title": _("Site"),
+        "type": CATEGORY,
+    }),
+))
+
+
+# Additional columns for the export of changes
+CHANGES_COLUMNS = OrderedDict((
+    # upsert key
+    ("uid", {
+        "title": _("Analysis UID"),
+        "type": TEXT,
+    }),
+    ("changed", {
+        "title": _("Date and time Changed"),
+        "type": DATETIME,
     }),
 ))
 
@@ -170,141 +274,144 @@ def get_dates_range(date_from, date_to):
     return date_from, date_to
 
 
-def get_age(dob, sampled):
-    """Returns the age truncated to the highest period
-    """
-    ymd = get_age_ymd(dob, sampled)
-    if not ymd:
-        return ""
-    # truncate to highest period
-    matches = re.match(r"^(\d+[ymd])", ymd)
-    return matches.groups()[0] if matches else ""
-
-
 def parse_date_to_output(date):
     """Parse date to localized string format
     """
     return dtime.to_localized_time(date, long_format=True) or ""
 
 
-def get_analysis_profiles(sample):
-    """Get analysis profiles for sample
+def get_columns(changes=False):
+    """Returns the definition of the columns of the export. The change feed
+    includes the columns of the upsert key and the date of the last change
     """
-    profiles = sample.getProfiles()
-    return [api.get_title(profile) for profile in profiles]
+    columns = OrderedDict()
+    if changes:
+        columns.update(CHANGES_COLUMNS)
+    columns.update(COLUMNS)
+    return columns
 
 
-def get_result_variables_text(analysis):
-    """Returns formatted result variables for the analysis
+def get_header_row(columns=COLUMNS):
+    """Returns a plain list with the column names
     """
-    interims = analysis.getInterimFields() or []
-    results = []
-    for interim in interims:
-        # skip if not shown in report
-        if not interim.get("report", False):
-            continue
-
-        formatted = format_interim(interim, html=False)
-
-        title = formatted.get("title", "").strip()
-        value = formatted.get("formatted_value", "").strip()
-        unit = formatted.get("formatted_unit", "").strip()
-
-        # combine value and unit
-        detail = (value + " " + unit) if value and unit else value
-
-        results.append("{}: {}".format(title, detail))
-
-    return "\n".join(results)
+    return [columns[key].get("title") for key in columns.keys()]
 
 
-def get_header_row():
-    """Returns a plain list with the column names
+def get_typed_columns(columns=COLUMNS):
+    """Returns a list of tuples (name, type) with the columns for typed
+    outputs
     """
-    return [COLUMNS[key].get("title") for key in COLUMNS.keys()]
+    return [(key, columns[key]["type"]) for key in columns.keys()]
 
 
-def get_row_info(analysis, sample):
+def get_row_info(analysis, sample_info, builder):
     """Get row information for analysis
     """
-    sampled = sample.getDateSampled()
-    dob = sample.getDateOfBirth()[0]
-    age = get_age(dob, sampled)
-
-    # Date formatting
-    sampled = parse_date_to_output(sampled)
-    created = parse_date_to_output(sample.created())
-    result_captured = parse_date_to_output(
-        analysis.getResultCaptureDate()
-    )
-    result_verified = parse_date_to_output(
-        analysis.getDateVerified()
-    )
-    result_published = parse_date_to_output(
-        analysis.getDatePublished()
-    )
-
-    # Only show results that appear on the final reports
-    result = analysis.getFormattedResult() or ""
-
-    # For multiple results, replace <br/> by comma and space
-    result = result.replace("<br/>", ", ")
+    info = builder.get_analysis_info(analysis, sample_info)
+    info.update({
+        "uid": api.get_uid(analysis),
+        "changed": get_analysis_date_changed(analysis),
+    })
 
-    # Get the department title
-    department = analysis.getDepartment()
-    department_title = api.get_title(department) if department else ""
+    # Result with units
+    unit = info["unit"]
+    info["result"] = info["result"] + (" " + unit if unit else "")
+    return info
 
-    # Get category
-    category = analysis.getCategoryUID()
-    category_title = api.get_title(category) if category else ""
 
-    # Get profiles/panels
-    profiles = get_analysis_profiles(sample)
+def get_text_row(info, columns=COLUMNS):
+    """Returns the row values as text, with dates localized
+    """
+    row = []
+    for key in columns.keys():
+        value = info.get(key, "")
+        if columns[key]["type"] == DATETIME:
+            value = parse_date_to_output(value)
+        row.append(value)
+    return row
 
-    # Format unit
-    unit = format_supsub(to_utf8(analysis.Unit)) if analysis.Unit else ""
 
-    # Get the patient's gender/sex
-    gender = dict(SEXES).get(sample.getSex())
-    gender = translate(gender) if gender else ""
+def get_typed_row(info, columns=COLUMNS):
+    """Returns the row values for typed outputs
+    """
+    row = []
+    for key in columns.keys():
+        key = columns[key].get("typed_key", key)
+        row.append(info.get(key))
+    return row
+
+
+def iter_infos(brains, builder):
+    """Yields the row information for the analysis brains passed-in, one per
+    reportable analysis. Analyses are loaded in batches grouped by sample,
+    so the info of each sample is computed only once. Non-reportable analyses
+    are discarded from their metadata, without loading them
+    """
+    brains = filter(ReportableEvaluator(), brains)
+    for sample, analyses in iter_samples(brains):
+        sample_info = None
+        for analysis in analyses:
+            # sample-specific info is shared by all its analyses
+            if sample_info is None:
+                sample_info = builder.get_sample_info(sample)
 
-    # Get analysis status
-    status = api.get_review_status(analysis)
+            # build the analysis row
+            yield get_row_info(analysis, sample_info, builder)
 
-    # Get formatted result variables
-    result_variables = get_result_variables_text(analysis)
 
-    return {
-        "sample_id": analysis.getRequestID(),
-        "tamanu_id": sample.getTamanuID() or "",
-        "sample_type": sample.getSampleTypeTitle() or "",
-        "age": age,
-        "gender": gender,
-        "collected": sampled,
-        "created": created,
-        "captured": result_captured,
-        "verified": result_verified,
-        "published": result_published,
-        "department": department_title,
-        "category": category_title,
-        "panels": ", ".join(profiles),
-        "test_id": analysis.getId() or "",
-        "test_type": analysis.Title(),
-        "result_variables": result_variables,
-        "result": result + (" " + unit if unit else ""),
-        "status": status,
-        "site": sample.getClientTitle() or ""
-    }
+class CSVWriter(object):
+    """Writes rows to a CSV file with all values quoted, encoded in UTF-8.
+    Files written without header can be merged by concatenation
+    """
+    extension = "csv"
+
+    def __init__(self, path, columns, header=True):
+        self.output = open(path, "wb")
+        if header:
+            # titles of the columns passed-in as tuples of (name, type)
+            definitions = get_columns(changes=True)
+            titles = [definitions[name]["title"] for name, _type in columns]
+            self.output.write(to_csv_line(titles))
+
+    def write(self, row):
+        self.output.write(to_csv_line(row))
+
+    def close(self):
+        self.output.close()
+
+    @classmethod
+    def merge(cls, parts, path, columns):
+        """Merges the part files written without header into a single file
+        """
+        header = cls(path, columns)
+        header.close()
+        with open(path, "ab") as output:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, output)
+
+
+def get_writer_class(output_format):
+    """Returns the class of the writer for the output format
+    """
+    if output_format == "typed":
+        return get_typed_writer_class()
+    return CSVWriter
 
 
-def do_export(date_from, date_to, output_file):
-    """Export data to CSV file
+def get_query(kind, date_from, date_to):
+    """Returns the catalog query for the analyses of the given kind
     """
-    # Get published analyses that were verified within the given date range
-    query_published = {
+    # Published analyses are filtered by verification date, while
+    # out_of_stock analyses are filtered by result capture date
+    index = "date_verified"
+    if kind == "out_of_stock":
+        index = "getResultCaptureDate"
+
+    return {
         "portal_type": "Analysis",
-        "review_state": ["published"],
-        "date_verified": {
+        "review_state": [kind],
+        index: {
             "query": [date_from, date_to],
             "range": "min:max",
         },
@@ -312,18 +419,178 @@ def do_export(date_from, date_to, output_file):
         "sort_order": "ascending",
     }
 
-    # Query for out_of_stock analyses using result capture date
-    query_out_of_stock = {
+
+def get_changes_query(since):
+    """Returns the catalog query for the analyses that changed since the
+    date passed-in
+    """
+    return {
         "portal_type": "Analysis",
-        "review_state": ["out_of_stock"],
-        "getResultCaptureDate": {
-            "query": [date_from, date_to],
-            "range": "min:max",
+        "review_state": list(KINDS),
+        "date_changed": {
+            "query": since,
+            "range": "min",
         },
-        "sort_on": "getDateReceived",
+        "sort_on": "date_changed",
         "sort_order": "ascending",
     }
 
+
+def get_chunks(date_from, date_to, days):
+    """Returns a list of tuples (from, to) that split the date range in
+    consecutive chunks of the given number of days
+    """
+    chunks = []
+    start = date_from
+    while start <= date_to:
+        end = min((start + days - 1).latestTime(), date_to)
+        chunks.append((start, end))
+        start = (end + 1).earliestTime()
+    return chunks
+
+
+def export_part(kind, date_from, date_to, writer, typed=False):
+    """Writes the rows of the analyses of the given kind within the date
+    range with the writer passed-in. Returns the number of rows written
+    """
+    logger.info("Exporting %s analyses from %s to %s ..." % (
+        kind, dtime.date_to_string(date_from), dtime.date_to_string(date_to)))
+
+    # Builder of the row values, with the titles of setup objects shared by
+    # all rows
+    builder = AnalysisRowBuilder()
+    get_row = get_typed_row if typed else get_text_row
+
+    num = 0
+    query = get_query(kind, date_from, date_to)
+    brains = api.search(query, ANALYSIS_CATALOG)
+    for info in iter_infos(brains, builder):
+        writer.write(get_row(info))
+        num += 1
+
+    logger.info("Exporting %s analyses from %s to %s: %s rows [DONE]" % (
+        kind, dtime.date_to_string(date_from), dtime.date_to_string(date_to),
+        num))
+    return num
+
+
+def export_changes(since, writer, typed=False):
+    """Writes the rows of the analyses that changed since the date passed-in
+    with the writer passed-in, including the upsert key. Returns the number
+    of rows written
+    """
+    logger.info("Exporting analyses changed since %s ..." % since)
+
+    builder = AnalysisRowBuilder()
+    columns = get_columns(changes=True)
+    get_row = get_typed_row if typed else get_text_row
+
+    num = 0
+    query = get_changes_query(since)
+    brains = api.search(query, ANALYSIS_CATALOG)
+    for info in iter_infos(brains, builder):
+        writer.write(get_row(info, columns=columns))
+        num += 1
+
+    logger.info("Exporting analyses changed since %s: %s rows [DONE]" % (
+        since, num))
+    return num
+
+
+def load_watermark(destination):
+    """Returns the date of the last successful export of changes to the
+    destination directory, or None
+    """
+    path = os.path.join(destination, CHANGES_STATE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f).get("watermark")
+
+
+def save_watermark(destination, watermark):
+    """Stores the date of the last successful export of changes to the
+    destination directory
+    """
+    path = os.path.join(destination, CHANGES_STATE_FILENAME)
+    tmp_path = "%s.tmp" % path
+    with open(tmp_path, "w") as f:
+        json.dump({"watermark": watermark}, f)
+    # rename is atomic, the watermark is never left half-written
+    os.rename(tmp_path, path)
+
+
+def do_export_changes(destination, since, default, output_format):
+    """Exports the analyses that changed since the date passed-in, or since
+    the last successful export to the destination directory if not set. If
+    there is none, the analyses that changed since default are exported
+    """
+    # changes made while exporting go to next run
+    started = dtime.now()
+
+    since = since or load_watermark(destination) or default
+    since = dtime.to_DT(since)
+
+    writer_class = get_writer_class(output_format)
+    filename = "analyses-changes-%s.%s" % (dtime.to_ansi(started),
+                                           writer_class.extension)
+    output_file = os.path.join(destination, filename)
+    columns = get_typed_columns(get_columns(changes=True))
+
+    writer = writer_class(output_file, columns)
+    try:
+        export_changes(since, writer, typed=output_format == "typed")
+    finally:
+        writer.close()
+
+    save_watermark(destination, started.ISO8601())
+
+
+def get_worker_command(args, kind, date_from, date_to, part_file):
+    """Returns the command to export a part of the data in a separate process
+    """
+    script = os.path.abspath(sys.argv[0])
+    command = [
+        args.instance, "run", script,
+        "--date_from", dtime.date_to_string(date_from),
+        "--date_to", dtime.date_to_string(date_to),
+        "--kind", kind,
+        "--part", part_file,
+        "--output_format", args.output_format,
+    ]
+    if args.verbose:
+        command.append("--verbose")
+    return command
+
+
+def run_workers(commands, workers):
+    """Runs the commands passed-in in separate processes, with no more than
+    the given number of processes at once. Raises a RuntimeError if any of
+    them fails
+    """
+    pending = list(commands)
+    running = []
+    while pending or running:
+        # start new processes while there are free slots
+        while pending and len(running) < workers:
+            command = pending.pop(0)
+            logger.debug("Starting worker: %s" % " ".join(command))
+            running.append(subprocess.Popen(command))
+
+        # wait for the oldest process to finish
+        process = running.pop(0)
+        if process.wait() != 0:
+            for other in running:
+                other.terminate()
+            raise RuntimeError("Worker failed with code %s" %
+                               process.returncode)
+
+
+def do_export(date_from, date_to, output_file, args=None):
+    """Export data to the output file. If more than one worker is set in
+    args, the date range is split in chunks that are exported by separate
+    processes and merged afterwards
+    """
     logger.info(
         "Exporting published and out_of_stock analyses from %s to %s ..." % (
             dtime.date_to_string(date_from),
@@ -331,48 +598,39 @@ def do_export(date_from, date_to, output_file):
         )
     )
 
-    # Generate one row per analysis
-    rows = []
-
-    # Process published analyses
-    for brain in api.search(query_published, ANALYSIS_CATALOG):
-        analysis = api.get_object(brain)
-        if not is_reportable(analysis):
-            analysis._p_deactivate()
-            continue
-
-        # build the analysis row
-        sample = analysis.getRequest()
-        info = get_row_info(analysis, sample)
-        row = [info.get(key, "") for key in COLUMNS.keys()]
-        rows.append(row)
-
-        # flush the sample and analysis from memory
-        analysis._p_deactivate()  # noqa
-        sample._p_deactivate()  # noqa
-
-    # Process out_of_stock analyses
-    for brain in api.search(query_out_of_stock, ANALYSIS_CATALOG):
-        analysis = api.get_object(brain)
-        if not is_reportable(analysis):
-            analysis._p_deactivate()
-            continue
-
-        # build the analysis row
-        sample = analysis.getRequest()
-        info = get_row_info(analysis, sample)
-        row = [info.get(key, "") for key in COLUMNS.keys()]
-        rows.append(row)
-
-        # flush the sample and analysis from memory
-        analysis._p_deactivate()  # noqa
-        sample._p_deactivate()  # noqa
-
-    # Insert the header row at first position
-    rows.insert(0, get_header_row())
-
-    # generate the csv
-    to_csv(rows, output_file)
+    workers = int(getattr(args, "workers", None) or 1)
+    output_format = getattr(args, "output_format", None) or "csv"
+    writer_class = get_writer_class(output_format)
+    typed = output_format == "typed"
+    columns = get_typed_columns()
+
+    if workers <= 1:
+        # rows are written to the file as soon as they are generated
+        writer = writer_class(output_file, columns)
+        try:
+            for kind in KINDS:
+                export_part(kind, date_from, date_to, writer, typed=typed)
+        finally:
+            writer.close()
+
+    else:
+        # one process per chunk and kind, each writing a part file
+        commands = []
+        parts = []
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(output_file))
+        chunks = get_chunks(date_from, date_to, int(args.chunk_days))
+        for kind in KINDS:
+            for num, (chunk_from, chunk_to) in enumerate(chunks):
+                part = os.path.join(tmp_dir, "%s-%04d.%s" % (
+                    kind, num, writer_class.extension))
+                commands.append(get_worker_command(args, kind, chunk_from,
+                                                   chunk_to, part))
+                parts.append(part)
+        try:
+            run_workers(commands, workers)
+            writer_class.merge(parts, output_file, columns)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
     logger.info(
         "Exporting published and out_of_stock analyses from %s to %s "
@@ -386,23 +644,20 @@ def do_export(date_from, date_to, output_file):
 def quote(value):
     """Adds double quotes around the value
     """
+    if not isinstance(value, string_types):
+        value = str(value)
     # strip empty spaces
-    value = str(value).strip()
+    value = api.safe_unicode(value).strip()
     # strip " and replace " by '
-    value = value.strip("\"").replace("\"", "'")
-    return "\"{}\"".format(value)
+    value = value.strip(u"\"").replace(u"\"", u"'")
+    return u"\"{}\"".format(value)
 
 
-def to_csv(rows, output_file):
-    """Returns a CSV-like string with quotes values
+def to_csv_line(row):
+    """Returns a CSV-like line with quoted values, encoded in UTF-8
     """
-    output = StringIO()
-    for row in rows:
-        output.write(",".join(map(quote, row)) + "\n")
-
-    output = api.safe_unicode(output.getvalue()).encode("utf-8")
-    with open(output_file, 'w') as f:
-        f.write(output)
+    line = u",".join(map(quote, row)) + u"\n"
+    return line.encode("utf-8")
 
 
 def main(app):
@@ -420,12 +675,6 @@ def main(app):
     if args.verbose:
         logger.setLevel(logging.DEBUG)
 
-    # destination path
-    destination = args.destination or os.getcwd()
-    if not os.path.exists(destination):
-        print("Destination directory does not exist: {}", args.destination)
-        exit(-1)
-
     # compute the date range (default: previous week)
     try:
         dt_from, dt_to = get_dates_range(args.date_from, args.date_to)
@@ -433,14 +682,42 @@ def main(app):
         print(str(e))
         exit(-1)
 
+    if args.part:
+        # worker process, export the part of data only
+        if args.kind not in KINDS:
+            print("Kind not supported: {}".format(args.kind))
+            exit(-1)
+        writer_class = get_writer_class(args.output_format)
+        writer = writer_class(args.part, get_typed_columns(), header=False)
+        try:
+            export_part(args.kind, dt_from, dt_to, writer,
+                        typed=args.output_format == "typed")
+        finally:
+            writer.close()
+        return
+
+    # destination path
+    destination = args.destination or os.getcwd()
+    if not os.path.exists(destination):
+        print("Destination directory does not exist: {}", args.destination)
+        exit(-1)
+
+    if args.changes:
+        # export changes since the date from if set explicitly, or since
+        # last run. Since the date from by default on first run
+        since = dt_from if args.date_from else None
+        do_export_changes(destination, since, dt_from, args.output_format)
+        return
+
     # output file
     ansi_from = dtime.to_ansi(dt_from, show_time=False)
     ansi_to = dtime.to_ansi(dt_to, show_time=False)
-    filename = "analyses-%s-%s.csv" % (ansi_from, ansi_to)
+    extension = get_writer_class(args.output_format).extension
+    filename = "analyses-%s-%s.%s" % (ansi_from, ansi_to, extension)
     out_file = os.path.join(destination, filename)
 
     # export the data
-    do_export(dt_from, dt_to, out_file)
+    do_export(dt_from, dt_to, out_file, args=args)
 
 
 if __name__ == "__main__":
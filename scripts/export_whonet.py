@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+
+from bes.lims import logger
+from bes.lims.browser.whonet import writers
+from bes.lims.browser.whonet.export import WHONETExportView
+from bes.lims.scripts import setup_script_environment
+from bika.lims import api
+from senaite.core.api import dtime
+from senaite.core.catalog import ANALYSIS_CATALOG
+from senaite.core.catalog import SAMPLE_CATALOG
+from six import StringIO
+from Testing.makerequest import makerequest
+
+
+__doc__ = """
+Incremental export of AST results to files that can be imported into WHONET
+software (https://www.whonet.org) through the data import module BacLink
+
+Exports the AST results from the samples that were published or modified
+since the last export. Lines are appended to the file of the current period
+(e.g. whonet-2025-03.csv), so the script can be run as often as needed. The
+date of the last export and the modification date of each exported sample
+are kept in a state file inside the destination directory, so samples are
+only exported again when they have changed since.
+"""
+
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument(
+    "-d", "--destination",
+    help="Destination directory for the WHONET files",
+)
+parser.add_argument(
+    "-p", "--period",
+    help="Period covered by each file: day, week, month or year. Default: "
+         "month",
+    default="month"
+)
+parser.add_argument(
+    "-f", "--format",
+    help="Format of the files: csv (quoted) or tab (tab-delimited). "
+         "Default: csv",
+    default="csv"
+)
+parser.add_argument(
+    "-e", "--encoding",
+    help="Encoding of the files: utf-8 or windows-1252. Default: utf-8",
+    default="utf-8"
+)
+parser.add_argument(
+    "-s", "--since",
+    help="Export the samples modified since this date (YYYY-MM-DD format) "
+         "instead of since the last export. Samples modified before the "
+         "last export are exported again"
+)
+parser.add_argument(
+    "-su", "--senaite_user",
+    help="SENAITE user",
+    default="admin"
+)
+parser.add_argument(
+    "-v", "--verbose", action="store_true",
+    help="Verbose logging"
+)
+
+# Name of the file that keeps the state of the exports in destination
+STATE_FILENAME = ".whonet-export.json"
+
+# Period covered by each file
+PERIODS = ("day", "week", "month", "year")
+
+# Formats that support appending lines to an existing file. Fixed-width is
+# not suitable because the width of the columns depends on the whole data
+APPEND_FORMATS = ("csv", "tab")
+
+
+def error(message, code=1):
+    """Exit with error
+    """
+    print("ERROR: %s" % message)
+    exit(code)
+
+
+def get_period_key(date, period):
+    """Returns the key that identifies the period the date belongs to
+    """
+    if period == "day":
+        return date.strftime("%Y-%m-%d")
+    if period == "week":
+        year, week, weekday = date.isocalendar()
+        return "%s-W%02d" % (year, week)
+    if period == "year":
+        return date.strftime("%Y")
+    return date.strftime("%Y-%m")
+
+
+def load_state(destination):
+    """Returns the state of the exports made to the destination directory
+    """
+    state = {"watermark": None, "samples": {}}
+    path = os.path.join(destination, STATE_FILENAME)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            state.update(json.load(f))
+    return state
+
+
+def save_state(destination, state):
+    """Stores the state of the exports made to the destination directory
+    """
+    path = os.path.join(destination, STATE_FILENAME)
+    tmp_path = "%s.tmp" % path
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    # rename is atomic, the state is never left half-written
+    os.rename(tmp_path, path)
+
+
+def search_samples(since):
+    """Returns the brains of the published samples modified since the date
+    """
+    query = {
+        "portal_type": "AnalysisRequest",
+        "review_state": "published",
+        "sort_on": "modified",
+        "sort_order": "ascending",
+    }
+    if since:
+        query["modified"] = {"query": since, "range": "min"}
+    return api.search(query, SAMPLE_CATALOG)
+
+
+def get_modified(brain):
+    """Returns the modification date of the brain as an ISO8601 string
+    """
+    return dtime.to_DT(brain.modified).ISO8601()
+
+
+def get_export_view():
+    """Returns the WHONET export view, that is used as the export engine
+    """
+    portal = api.get_portal()
+    request = api.get_request()
+    if request is None:
+        # the view memoizes values in the request
+        request = makerequest(portal).REQUEST
+    return WHONETExportView(portal, request)
+
+
+def search_analyses(view, samples):
+    """Returns the brains of the AST analyses to export from the sample
+    brains passed-in
+    """
+    query = {
+        "portal_type": "Analysis",
+        "review_state": ["verified", "published"],
+        "getKeyword": view.get_ast_keywords(),
+        "getAncestorsUIDs": map(api.get_uid, samples),
+        "sort_on": "getRequestID",
+        "sort_order": "ascending"
+    }
+    brains = api.search(query, ANALYSIS_CATALOG)
+    published = set(map(api.get_path, samples))
+    return view.filter_analyses(brains, published=published)
+
+
+def to_bytes(lines, fmt, encoding):
+    """Returns the lines passed-in formatted and encoded as a string
+    """
+    output = StringIO()
+    writers.write(lines, output, fmt=fmt, encoding=encoding)
+    return output.getvalue()
+
+
+def get_output_file(destination, period, fmt, header):
+    """Returns the path of the file to write the lines of the current period.
+    If the file of the period has a different header (e.g. antibiotics were
+    added since), a new file for the period is returned
+    """
+    title, extension, content_type = writers.FORMATS[fmt]
+    key = get_period_key(datetime.now(), period)
+    path = os.path.join(destination, "whonet-%s.%s" % (key, extension))
+    if not os.path.exists(path):
+        return path
+
+    with open(path, "r") as f:
+        if f.readline() == header:
+            return path
+
+    suffix = datetime.now().strftime("%Y%m%d%H%M%S")
+    return os.path.join(destination, "whonet-%s-%s.%s" % (key, suffix,
+                                                          extension))
+
+
+def do_export(destination, since, period, fmt, encoding):
+    """Appends the AST results from the published samples modified since the
+    last export to the file of the current period
+    """
+    # keep track of the start, changes made while exporting go to next run
+    started = dtime.now().ISO8601()
+
+    state = load_state(destination)
+    exported = state.get("samples") or {}
+    since = since or state.get("watermark")
+    logger.info("Exporting WHONET data since %s ..." % (since or "ever"))
+
+    # skip the samples exported already, unless they changed since
+    changed = {}
+    samples = []
+    for brain in search_samples(since):
+        uid = api.get_uid(brain)
+        modified = get_modified(brain)
+        if exported.get(uid) == modified:
+            continue
+        changed[uid] = modified
+        samples.append(brain)
+
+    logger.info("Samples to export: %s" % len(changed))
+    if changed:
+        view = get_export_view()
+
+        brains = search_analyses(view, samples)
+        records = view.get_records(brains)
+        # all antibiotics, so the header is the same across runs and lines
+        # can be appended to the file of the period
+        antibiotics = view.get_columns()
+        lines = view.get_lines(records, antibiotics)
+
+        # the first line is the header
+        header = to_bytes([next(lines)], fmt, encoding)
+        path = get_output_file(destination, period, fmt, header)
+        new_file = not os.path.exists(path)
+        with open(path, "ab") as f:
+            if new_file:
+                f.write(header)
+            num = writers.write(lines, f, fmt=fmt, encoding=encoding)
+
+        logger.info("Lines written to %s: %s" % (path, num))
+        exported.update(changed)
+
+    # samples modified before the watermark are not searched next time
+    watermark = dtime.to_DT(started)
+    exported = dict([(uid, modified) for uid, modified in exported.items()
+                     if dtime.to_DT(modified) >= watermark])
+
+    state.update({
+        "watermark": started,
+        "samples": exported,
+    })
+    save_state(destination, state)
+    logger.info("Exporting WHONET data since %s [DONE]" % (since or "ever"))
+
+
+def main(app):
+    args, _ = parser.parse_known_args()
+    if hasattr(args, "help") and args.help:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    username = args.senaite_user
+    if not username:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    destination = args.destination or os.getcwd()
+    if not os.path.isdir(destination):
+        error("Destination directory does not exist: %s" % destination)
+
+    if args.period not in PERIODS:
+        error("Period not supported: %s" % args.period)
+
+    if args.format not in APPEND_FORMATS:
+        error("Format not supported: %s" % args.format)
+
+    if args.encoding not in writers.ENCODINGS:
+        error("Encoding not supported: %s" % args.encoding)
+
+    since = args.since
+    if since:
+        if not dtime.is_date(since):
+            error("Invalid date format. Use YYYY-MM-DD")
+        since = dtime.to_DT(since).earliestTime().ISO8601()
+
+    # verbose logging
+    log_mode = logging.DEBUG if args.verbose else logging.INFO
+    logger.setLevel(log_mode)
+
+    # Setup environment
+    setup_script_environment(app, stream_out=True, username=username,
+                             logger=logger)
+
+    # do the work
+    logger.info("-" * 79)
+    do_export(destination, since, args.period, args.format, args.encoding)
+    logger.info("-" * 79)
+
+
+if __name__ == "__main__":
+    main(app)  # noqa: F821
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import transaction
+from bes.lims import logger
+from bes.lims.scripts import setup_script_environment
+from bes.lims.scripts.rebuild import CatalogRebuilder
+from bes.lims.scripts.rebuild import split_folders
+from bika.lims import api
+
+
+__doc__ = """
+Clears and rebuilds the catalogs passed-in with a single walk through the
+site, so each object is loaded only once and indexed in all the catalogs it
+belongs to. Changes are committed in batches, with progress and estimated
+time logged after each commit.
+
+The walk can be split across several worker processes (separate database
+clients), each one taking care of a group of top-level folders, e.g:
+
+    bin/instance run rebuild_catalogs.py \\
+        -c senaite_catalog_sample,senaite_catalog_analysis,uid_catalog -w 4
+"""
+
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument(
+    "-c", "--catalogs",
+    help="Comma-separated list of the ids of the catalogs to rebuild",
+    default=""
+)
+parser.add_argument(
+    "-b", "--batch_size",
+    help="Number of objects to visit before each commit. Default: 1000",
+    default="1000"
+)
+parser.add_argument(
+    "-w", "--workers",
+    help="Number of worker processes (separate database clients) that walk "
+         "the top-level folders in parallel. Default: 1",
+    default="1"
+)
+parser.add_argument(
+    "-i", "--instance",
+    help="Instance script used to start the worker processes. Default: "
+         "bin/instance",
+    default="bin/instance"
+)
+parser.add_argument(
+    "--folders",
+    help=argparse.SUPPRESS
+)
+parser.add_argument(
+    "--paths_dir",
+    help=argparse.SUPPRESS
+)
+parser.add_argument(
+    "--estimate",
+    help=argparse.SUPPRESS
+)
+parser.add_argument(
+    "-su", "--senaite_user",
+    help="SENAITE user",
+    default="admin"
+)
+parser.add_argument(
+    "-v", "--verbose", action="store_true",
+    help="Verbose logging"
+)
+
+
+def error(message, code=1):
+    """Exit with error
+    """
+    print("ERROR: %s" % message)
+    exit(code)
+
+
+def get_worker_command(args, folders, paths_dir, estimate):
+    """Returns the command to rebuild the catalogs for the folders passed-in
+    in a separate process, with the estimated number of objects to visit
+    """
+    script = os.path.abspath(sys.argv[0])
+    command = [
+        args.instance, "run", script,
+        "--catalogs", args.catalogs,
+        "--batch_size", args.batch_size,
+        "--folders", ",".join([api.get_id(folder) for folder in folders]),
+        "--paths_dir", paths_dir,
+        "--estimate", str(estimate),
+        "--senaite_user", args.senaite_user,
+    ]
+    if args.verbose:
+        command.append("--verbose")
+    return command
+
+
+def run_workers(commands):
+    """Runs the commands passed-in in separate processes at once. Raises a
+    RuntimeError if any of them fails
+    """
+    processes = []
+    for command in commands:
+        logger.debug("Starting worker: %s" % " ".join(command))
+        processes.append(subprocess.Popen(command))
+
+    failed = filter(lambda process: process.wait() != 0, processes)
+    if failed:
+        raise RuntimeError("%s workers failed" % len(failed))
+
+
+def do_rebuild(rebuilder, args, workers):
+    """Clears and rebuilds the catalogs, with the top-level folders split
+    across the given number of worker processes
+    """
+    rebuilder.prepare()
+
+    if workers <= 1:
+        rebuilder.clear()
+        rebuilder.rebuild()
+        rebuilder.refresh_leftovers()
+        return
+
+    # workers need the paths cataloged before clearing
+    paths_dir = tempfile.mkdtemp()
+    try:
+        rebuilder.save_paths(paths_dir)
+        rebuilder.clear()
+
+        folders = filter(api.is_object, api.get_portal().objectValues())
+        groups = split_folders(folders, workers, rebuilder.sizes)
+        commands = []
+        for group in groups:
+            ids = map(api.get_id, group)
+            estimate = sum([rebuilder.sizes.get(fid, 1) for fid in ids])
+            commands.append(get_worker_command(args, group, paths_dir,
+                                               estimate))
+        run_workers(commands)
+
+        # see the changes committed by the workers
+        transaction.begin()
+        rebuilder.refresh_leftovers()
+    finally:
+        shutil.rmtree(paths_dir)
+
+
+def main(app):
+    args, _ = parser.parse_known_args()
+    if hasattr(args, "help") and args.help:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    username = args.senaite_user
+    if not username:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    catalogs = filter(None, [cat.strip() for cat in args.catalogs.split(",")])
+    if not catalogs:
+        error("No catalogs to rebuild")
+
+    batch_size = api.to_int(args.batch_size, default=0)
+    if batch_size < 1:
+        error("Invalid batch size: %s" % args.batch_size)
+
+    workers = api.to_int(args.workers, default=0)
+    if workers < 1:
+        error("Invalid number of workers: %s" % args.workers)
+
+    # verbose logging
+    log_mode = logging.DEBUG if args.verbose else logging.INFO
+    logger.setLevel(log_mode)
+
+    # Setup environment
+    setup_script_environment(app, stream_out=True, username=username,
+                             logger=logger)
+
+    portal = api.get_portal()
+    missing = filter(lambda cat: cat not in portal.objectIds(), catalogs)
+    if missing:
+        error("Catalogs not found: %s" % ", ".join(missing))
+
+    rebuilder = CatalogRebuilder(catalogs, batch_size=batch_size)
+
+    if args.folders:
+        # worker process, rebuild the catalogs for the folders only
+        rebuilder.load_paths(args.paths_dir)
+        rebuilder.estimate = api.to_int(args.estimate, default=0)
+        folders = [portal[folder_id] for folder_id in args.folders.split(",")]
+        rebuilder.rebuild(folders)
+        return
+
+    # do the work
+    logger.info("-" * 79)
+    logger.info("Rebuilding catalogs %s ..." % ", ".join(catalogs))
+    do_rebuild(rebuilder, args, workers)
+    logger.info("Rebuilding catalogs [DONE]")
+    logger.info("-" * 79)
+
+
+if __name__ == "__main__":
+    main(app)  # noqa: F821
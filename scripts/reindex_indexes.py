@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+
+from bes.lims import logger
+from bes.lims.scripts import setup_script_environment
+from bes.lims.scripts.utils import get_partition
+from bes.lims.scripts.utils import reindex_indexes
+from bika.lims import api
+
+
+__doc__ = """
+Reindexes only the indexes passed-in (and optionally the metadata) of the
+objects from a catalog, without the need of clearing and rebuilding the whole
+catalog. Changes are committed in batches and the progress is stored in a
+checkpoint file, so the script resumes from where it was if interrupted.
+
+The work can be split across several database clients (ZEO) by running the
+script once per client with same --parts and a different --part each, e.g:
+
+    bin/client1 run reindex_indexes.py -c senaite_catalog_sample \\
+        -i department_uid --parts 2 --part 0
+    bin/client2 run reindex_indexes.py -c senaite_catalog_sample \\
+        -i department_uid --parts 2 --part 1
+"""
+
+parser = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument(
+    "-c", "--catalog",
+    help="Id of the catalog, e.g. senaite_catalog_analysis",
+)
+parser.add_argument(
+    "-i", "--indexes",
+    help="Comma-separated list of the indexes to reindex",
+    default=""
+)
+parser.add_argument(
+    "-m", "--metadata", action="store_true",
+    help="Update the metadata columns as well"
+)
+parser.add_argument(
+    "-t", "--portal_type",
+    help="Reindex the objects of this portal type only"
+)
+parser.add_argument(
+    "-b", "--batch_size",
+    help="Number of objects to reindex before each commit. Default: 500",
+    default="500"
+)
+parser.add_argument(
+    "--parts",
+    help="Number of partitions the objects are split into by path, one per "
+         "database client. Default: 1",
+    default="1"
+)
+parser.add_argument(
+    "--part",
+    help="Partition to process by this client, from 0 to parts-1. Default: 0",
+    default="0"
+)
+parser.add_argument(
+    "--checkpoint",
+    help="Checkpoint file to resume from. Default: "
+         ".reindex-<catalog>-<part>.json in current directory"
+)
+parser.add_argument(
+    "--restart", action="store_true",
+    help="Discard the checkpoint and start from the beginning"
+)
+parser.add_argument(
+    "-su", "--senaite_user",
+    help="SENAITE user",
+    default="admin"
+)
+parser.add_argument(
+    "-v", "--verbose", action="store_true",
+    help="Verbose logging"
+)
+
+
+def error(message, code=1):
+    """Exit with error
+    """
+    print("ERROR: %s" % message)
+    exit(code)
+
+
+def search_brains(catalog_id, portal_type=None):
+    """Returns the brains from the catalog to be reindexed
+    """
+    catalog = api.get_tool(catalog_id)
+    if portal_type:
+        return catalog(portal_type=portal_type)
+    return catalog.getAllBrains()
+
+
+def main(app):
+    args, _ = parser.parse_known_args()
+    if hasattr(args, "help") and args.help:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    username = args.senaite_user
+    if not username or not args.catalog:
+        print("")
+        parser.print_help()
+        return parser.exit()
+
+    indexes = filter(None, [idx.strip() for idx in args.indexes.split(",")])
+    if not indexes and not args.metadata:
+        error("No indexes to reindex")
+    if not indexes:
+        # all indexes are reindexed when none is set, use a cheap one
+        indexes = ["UID"]
+
+    batch_size = api.to_int(args.batch_size, default=0)
+    if batch_size < 1:
+        error("Invalid batch size: %s" % args.batch_size)
+
+    parts = api.to_int(args.parts, default=0)
+    part = api.to_int(args.part, default=-1)
+    if parts < 1 or part < 0 or part >= parts:
+        error("Invalid partition: %s of %s" % (args.part, args.parts))
+
+    checkpoint = args.checkpoint
+    if not checkpoint:
+        filename = ".reindex-%s-%s.json" % (args.catalog, part)
+        checkpoint = os.path.join(os.getcwd(), filename)
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    # verbose logging
+    log_mode = logging.DEBUG if args.verbose else logging.INFO
+    logger.setLevel(log_mode)
+
+    # Setup environment
+    setup_script_environment(app, stream_out=True, username=username,
+                             logger=logger)
+
+    if args.catalog not in api.get_portal().objectIds():
+        error("Catalog not found: %s" % args.catalog)
+
+    # do the work
+    logger.info("-" * 79)
+    brains = search_brains(args.catalog, portal_type=args.portal_type)
+    brains = get_partition(brains, parts, part)
+    logger.info("Partition %s of %s: %s objects" % (part + 1, parts,
+                                                    len(brains)))
+    try:
+        reindex_indexes(args.catalog, indexes, brains,
+                        update_metadata=args.metadata,
+                        batch_size=batch_size,
+                        checkpoint_path=checkpoint)
+    except ValueError as e:
+        error(str(e))
+    logger.info("-" * 79)
+
+
+if __name__ == "__main__":
+    main(app)  # noqa: F821
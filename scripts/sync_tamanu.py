@@ -739,6 +739,9 @@ def edit_sample(sample, **kwargs):
     # edit the sample
     api.edit(sample, **kwargs)
 
+    # api.edit does not reindex the sample
+    sample.reindexObject()
+
 
 def get_cache_file():
     """Returns the file for caching
@@ -68,6 +68,11 @@ setup(
         "senaite.patient>=1.5.0",
     ],
     extras_require={
+        # Parquet output for typed exports of analyses
+        # Python 2.7: pyarrow < 0.17.0
+        "parquet": [
+            "pyarrow < 0.17.0",
+        ],
         "test": [
             "plone.app.testing",
             "unittest2",
@@ -18,6 +18,9 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+
+import threading
+
 from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
 from bika.lims.utils import createPdf
 from bes.lims import logger
@@ -26,17 +29,33 @@ from plone.namedfile.file import NamedBlobFile
 from senaite.impress.decorators import synchronized
 from senaite.impress.storage import PdfReportStorageAdapter as BaseAdapter
 from bika.lims.workflow import doActionFor as do_action_for
-from PyPDF2 import PdfMerger
 from PyPDF2 import PdfReader
 from PyPDF2 import PdfWriter
 from StringIO import StringIO
 
+# Rendered watermark pages, keyed by (text, layout). Rendering the watermark
+# is expensive, and the same one is used for all the reports with same size
+WATERMARKS = {}
+WATERMARKS_LOCK = threading.Lock()
+
+
+def get_layout(page):
+    """Returns the CSS page size of the PDF page passed-in, in points
+    """
+    box = page.mediabox
+    return "{}pt {}pt".format(int(round(box.width)), int(round(box.height)))
+
 
 class PdfReportStorageAdapter(BaseAdapter):
     """Storage adapter for PDF reports with PDF attachment support
     """
     template = ViewPageTemplateFile("templates/watermark.pt")
 
+    def __init__(self, context, request):
+        super(PdfReportStorageAdapter, self).__init__(context, request)
+        # parsed attachments, shared by all reports of the publish batch
+        self.attachments = {}
+
     def get_pdf_attachments(self, parent):
         """Get PDF attachments that are flagged for rendering in report
         """
@@ -60,63 +79,85 @@ class PdfReportStorageAdapter(BaseAdapter):
 
         return pdf_attachments
 
-    def merge_pdf_attachments(self, main_pdf, attachments):
-        """Merge PDF attachments into the main PDF
+    def read_attachment(self, attachment):
+        """Returns a new PDF reader for the attachment passed-in
         """
-        if not attachments:
-            return main_pdf
-
-        # Create PDF merger
-        merger = PdfMerger()
-
-        main_pdf_stream = StringIO(main_pdf)
-        merger.append(main_pdf_stream)
-
-        # Add each PDF attachment
-        for attachment in attachments:
-            attachment_file = attachment.getAttachmentFile()
-            attachment_data = attachment_file.data
-            attachment_stream = StringIO(attachment_data)
-            merger.append(attachment_stream)
+        attachment_file = attachment.getAttachmentFile()
+        return PdfReader(StringIO(attachment_file.data))
 
-        output = StringIO()
-        merger.write(output)
-        merged_pdf = output.getvalue()
-        output.close()
-        merger.close()
+    def get_attachment_reader(self, attachment):
+        """Returns the PDF reader for the attachment passed-in. Attachments are
+        parsed only once per publish batch, for which the same adapter is used
+        """
+        uid = api.get_uid(attachment)
+        reader = self.attachments.get(uid)
+        if reader is None:
+            reader = self.read_attachment(attachment)
+            self.attachments[uid] = reader
+        return reader
+
+    def get_watermark_page(self, text, layout):
+        """Returns the PDF page with the watermark text for the given layout.
+        Pages are rendered once per process and kept in memory
+        """
+        key = (text, layout)
+        page = WATERMARKS.get(key)
+        if page is None:
+            with WATERMARKS_LOCK:
+                page = WATERMARKS.get(key)
+                if page is None:
+                    watermark_pdf = self.create_watermark_pdf(text, layout)
+                    page = PdfReader(StringIO(watermark_pdf)).pages[0]
+                    WATERMARKS[key] = page
+        return page
+
+    def create_watermark_pdf(self, text, layout=None):
+        """Create watermark PDF data with embedded text
+        """
+        watermark_pdf = createPdf(self.template(text=text, layout=layout))
+        return watermark_pdf
 
-        return merged_pdf
+    def merge_pdf_attachments(self, main_pdf, attachments):
+        """Merge PDF attachments into the main PDF
+        """
+        return self.build_pdf(main_pdf, attachments=attachments)
 
-    def apply_watermark(self, input_pdf, watermark_pdf):
-        """Apply watermark to PDF data
+    def build_pdf(self, main_pdf, attachments=None, watermark=None):
+        """Returns the PDF data of the main PDF followed by the pages of the
+        attachments, with the watermark text applied to all pages if set. The
+        result is written in a single pass
         """
-        # Read the PDF
-        pdf_reader = PdfReader(StringIO(input_pdf))
-        writer = PdfWriter()
+        if not any([attachments, watermark]):
+            return main_pdf
 
-        # watermark_pdf_stream = StringIO(watermark_pdf_data)
-        watermark_pdf_reader = PdfReader(StringIO(watermark_pdf))
-        watermark_page = watermark_pdf_reader.pages[0]
+        readers = [PdfReader(StringIO(main_pdf))]
+        for attachment in attachments or []:
+            if watermark:
+                # the watermark is merged onto the pages, do not modify the
+                # pages of the attachments shared with other reports
+                readers.append(self.read_attachment(attachment))
+            else:
+                readers.append(self.get_attachment_reader(attachment))
 
-        # Process each page
-        for page_num in range(pdf_reader.getNumPages()):
-            pdf_page = pdf_reader.pages[page_num]
-            pdf_page.merge_page(watermark_page)
-            writer.add_page(pdf_page)
+        writer = PdfWriter()
+        for reader in readers:
+            for page in reader.pages:
+                if watermark:
+                    self.apply_watermark(page, watermark)
+                writer.add_page(page)
 
-        # Write the watermarked PDF
         output = StringIO()
         writer.write(output)
         pdf = output.getvalue()
         output.close()
-
         return pdf
 
-    def create_watermark_pdf(self, text):
-        """Create watermark PDF data with embedded text
+    def apply_watermark(self, page, text):
+        """Merges the watermark text onto the page passed-in
         """
-        watermark_pdf = createPdf(self.template(text=text))
-        return watermark_pdf
+        layout = get_layout(page)
+        watermark_page = self.get_watermark_page(text, layout)
+        page.merge_page(watermark_page)
 
     @synchronized(max_connections=1)
     def create_report(self, parent, pdf, html, uids, metadata):
@@ -141,14 +182,14 @@ class PdfReportStorageAdapter(BaseAdapter):
         # Get PDF attachments that should be merged
         pdf_attachments = self.get_pdf_attachments(parent)
 
-        # Merge PDF attachments into the main PDF if any exist
-        if pdf_attachments:
-            pdf = self.merge_pdf_attachments(pdf, pdf_attachments)
-
         # Apply watermark if sample is invalid
+        watermark = None
         if api.get_review_status(parent) == "invalid":
-            watermark_pdf = self.create_watermark_pdf("INVALID")
-            pdf = self.apply_watermark(pdf, watermark_pdf)
+            watermark = "INVALID"
+
+        # Merge PDF attachments and apply the watermark in a single pass
+        pdf = self.build_pdf(pdf, attachments=pdf_attachments,
+                             watermark=watermark)
 
         # Convert PDF binary data to NamedBlobFile
         pdf_filename = "{}.pdf".format(parent_id)
@@ -18,25 +18,30 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from bes.lims.browser.whonet import writers
 from bes.lims.config import CULTURE_INTERPRETATION_KEYWORD
+from bes.lims.iterators import get_temporary_file
+from bes.lims.iterators import TemporaryFileIterator
+from bes.lims.reports.cache import SETUP_TYPES
+from bes.lims.reports.cache import TitleCache
+from bes.lims.reports.loader import group_by_sample
+from bes.lims.reports.loader import iter_samples
 from bes.lims.utils import get_field_value
 from bika.lims import api
 from bika.lims.interfaces import IVerified
 from datetime import datetime
 from plone.app.layout.globals.interfaces import IViewView
 from plone.memoize.view import memoize
-from Products.CMFPlone.utils import safe_unicode
 from Products.Five.browser import BrowserView
 from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
 from senaite.ast.config import ZONE_SIZE_KEY
-from senaite.ast.utils import get_antibiotics
 from senaite.core.api import dtime
 from senaite.core.catalog import ANALYSIS_CATALOG
+from senaite.core.catalog import SAMPLE_CATALOG
 from senaite.core.catalog import SETUP_CATALOG
 from senaite.core.decorators import readonly_transaction
 from senaite.core.interfaces import IHideActionsMenu
 from senaite.patient import api as patient_api
-from six import StringIO
 from zope.interface import implementer
 
 
@@ -48,6 +53,11 @@ class WHONETExportView(BrowserView):
     """
     template = ViewPageTemplateFile("templates/export.pt")
 
+    def __init__(self, context, request):
+        super(WHONETExportView, self).__init__(context, request)
+        # titles of setup objects, shared by all rows
+        self.titles = TitleCache(portal_types=SETUP_TYPES + ("Antibiotic",))
+
     @readonly_transaction
     def __call__(self):
 
@@ -59,24 +69,28 @@ class WHONETExportView(BrowserView):
 
         if form_submitted and form_export:
             # Search the analyses
-            analyses = self.search_analyses()
-            if analyses:
+            brains = self.search_analyses()
+            if brains:
 
-                # Generate the CSV-like data for Baclink
-                output = self.get_export_output(analyses)
+                # Generate the data for Baclink in a temporary file
+                fmt = self.export_format
+                encoding = self.encoding
+                output = self.get_export_output(brains, fmt, encoding)
+                stream = TemporaryFileIterator(output)
 
-                # Establish the HTTP response header as text/csv file
+                # Establish the HTTP response header for file download
+                title, extension, content_type = writers.FORMATS[fmt]
                 date = datetime.now().strftime("%Y%m%d%H%M")
                 set_header = self.request.RESPONSE.setHeader
-                set_header("Content-Type", "text/csv")
-                set_header("Content-Length", len(output))
+                set_header("Content-Type", "%s; charset=%s" % (content_type,
+                                                               encoding))
+                set_header("Content-Length", len(stream))
                 set_header("Cache-Control", "no-store")
                 set_header("Pragma", "no-cache")
                 set_header("Content-Disposition",
-                           "attachment;filename=\"export%s.csv\"" % date)
-                output = safe_unicode(output).encode("utf-8")
-                self.request.RESPONSE.write(output)
-                return
+                           "attachment;filename=\"export%s.%s\"" % (date,
+                                                                   extension))
+                return stream
 
         return self.template()
 
@@ -86,6 +100,36 @@ class WHONETExportView(BrowserView):
         """
         return self.request.form or {}
 
+    @property
+    def export_format(self):
+        """Returns the format of the file to export
+        """
+        fmt = self.form.get("format")
+        if fmt not in writers.FORMATS:
+            return writers.DEFAULT_FORMAT
+        return fmt
+
+    @property
+    def encoding(self):
+        """Returns the encoding of the file to export
+        """
+        encoding = self.form.get("encoding")
+        if encoding not in writers.ENCODINGS:
+            return writers.DEFAULT_ENCODING
+        return encoding
+
+    def get_formats(self):
+        """Returns the list of formats available for the export
+        """
+        return [{"id": key, "title": value[0]}
+                for key, value in writers.FORMATS.items()]
+
+    def get_encodings(self):
+        """Returns the list of encodings available for the export
+        """
+        return [{"id": key, "title": value}
+                for key, value in writers.ENCODINGS.items()]
+
     @property
     def created_from(self):
         """Returns the creation date of the oldest AST analysis to export
@@ -131,8 +175,9 @@ class WHONETExportView(BrowserView):
         return keyword.startswith(CULTURE_INTERPRETATION_KEYWORD)
 
     def search_analyses(self):
-        """Returns a list of sensitivity category analyses that match with the
-        creation date criteria
+        """Returns the list of brains from sensitivity category analyses that
+        match with the creation date criteria and belong to published samples,
+        grouped by sample
         """
         keywords = self.get_ast_keywords()
         query = {
@@ -145,38 +190,50 @@ class WHONETExportView(BrowserView):
             "sort_on": "getRequestID",
             "sort_order": "ascending"
         }
-
-        def ast_sort(a, b):
-            if a.getRequestID != b.getRequestID:
-                return 0
-            a_key = a.getKeyword
-            b_key = b.getKeyword
-            if a_key == b_key:
-                return 0
-            if self.is_culture_interpretation(a_key):
-                return 1
-            return -1
-
-        # Skip culture interpretation analyses with a zone size counterpart
-        purged = []
-        current_sample_id = None
         brains = api.search(query, ANALYSIS_CATALOG)
-        for brain in sorted(brains, cmp=ast_sort):
-            sample_id = brain.getRequestID
-            if sample_id == current_sample_id:
-                if self.is_culture_interpretation(brain.getKeyword):
-                    continue
-            purged.append(brain)
-            current_sample_id = brain.getRequestID
-
-        # Fill with analysis objects
-        analyses = map(self.get_object, purged)
-        analyses = filter(None, analyses)
+        return self.filter_analyses(brains)
 
-        # Exclude analyses that belong to not-yet-verified samples
-        analyses = filter(self.is_sample_published, analyses)
+    def filter_analyses(self, brains, published=None):
+        """Returns the analysis brains passed-in that belong to published
+        samples, grouped by sample and without the redundant culture
+        interpretation analyses. If published is not None, it is used as the
+        set of paths of the samples that are published
+        """
+        groups = group_by_sample(brains)
+
+        # Exclude analyses that belong to not-yet-published samples
+        if published is None:
+            published = self.get_published_samples(groups.keys())
+
+        analyses = []
+        for sample_path, items in groups.items():
+            if sample_path not in published:
+                continue
+            # Skip culture interpretation analyses with a zone size counterpart
+            analyses.extend(self.purge_culture_interpretations(items))
+        return analyses
+
+    def purge_culture_interpretations(self, brains):
+        """Returns the brains passed-in, all from the same sample, without the
+        culture interpretation analyses if the sample has zone size analyses.
+        Otherwise, returns only the first culture interpretation analysis
+        """
+        zone_size = [brain for brain in brains
+                     if not self.is_culture_interpretation(brain.getKeyword)]
+        return zone_size or brains[:1]
 
-        return list(analyses)
+    def get_published_samples(self, paths):
+        """Returns the subset of sample paths passed-in that are published
+        """
+        if not paths:
+            return set()
+        query = {
+            "portal_type": "AnalysisRequest",
+            "path": {"query": list(paths), "depth": 0},
+            "review_state": "published",
+        }
+        brains = api.search(query, SAMPLE_CATALOG)
+        return set([api.get_path(brain) for brain in brains])
 
     def get_object(self, brain_object_uid, default=None):
         """Returns the object or default if not reachable
@@ -198,19 +255,77 @@ class WHONETExportView(BrowserView):
         sample = analysis.getRequest()
         return api.get_review_status(sample) == "published"
 
-    def get_export_output(self, analyses, delimiter=","):
-        """Returns a CSV-like string with the data to be exported
+    def get_records(self, brains):
+        """Yields tuples (sample info, microorganism, results) from the
+        analysis brains passed-in, where results is a dict of antibiotic
+        uid -> result. Samples and analyses are loaded in batches and flushed
+        from memory once their data has been extracted
         """
-        # Get ZONE_SIZE analyses
         skip = filter(self.is_culture_interpretation, self.get_ast_keywords())
-        zone_ans = filter(lambda an: an.getKeyword() not in skip, analyses)
 
+        for sample, analyses in iter_samples(brains):
+            sample_info = self.get_sample_info(sample)
+            for analysis in analyses:
+                # Default values for when analysis is not a zone-size
+                microorganism = "no growth"
+                results = {}
+                if analysis.getKeyword() not in skip:
+                    # The microorganism name is the ShortTitle
+                    microorganism = analysis.getShortTitle()
+                    results = self.get_results(analysis)
+                yield sample_info, microorganism, results
+
+    def get_results(self, analysis):
+        """Returns a dict of antibiotic uid -> diameter (mm) result for the
+        zone size analysis passed-in
+        """
+        results = {}
+        for interim in analysis.getInterimFields():
+            uid = interim.get("uid")
+            if api.is_uid(uid):
+                results[uid] = interim.get("value", "")
+        return results
+
+    @memoize
+    def get_columns(self):
+        """Returns the list of uids of all antibiotics, sorted by title. The
+        columns are known beforehand, so records are written as extracted
+        """
+        query = {"portal_type": "Antibiotic"}
+        uids = [api.get_uid(brain) for brain in
+                api.search(query, SETUP_CATALOG)]
+        return sorted(uids, key=self.get_title)
+
+    def get_export_output(self, brains, fmt=writers.DEFAULT_FORMAT,
+                          encoding=writers.DEFAULT_ENCODING):
+        """Writes the data to be exported in the format and encoding passed-in
+        to a temporary file, line by line, and returns the file
+        """
         # Get all antibiotics and sort them by title
-        antibiotics = get_antibiotics(zone_ans)
-        antibiotics_titles = map(api.get_title, antibiotics)
+        antibiotics = self.get_columns()
+
+        widths = None
+        if fmt == "fixed":
+            # The width of each column is required beforehand, so the data
+            # is extracted from the analyses twice
+            records = self.get_records(brains)
+            widths = writers.get_widths(self.get_lines(records, antibiotics))
+
+        # Extract the data from the analyses and their samples
+        output = get_temporary_file()
+        records = self.get_records(brains)
+        lines = self.get_lines(records, antibiotics)
+        writers.write(lines, output, fmt=fmt, encoding=encoding, widths=widths)
+        return output
+
+    def get_lines(self, records, antibiotics):
+        """Yields the header and the data lines to be exported from the
+        records and antibiotic uids passed-in
+        """
+        # Position of each antibiotic in the data line
+        offsets = dict([(uid, pos) for pos, uid in enumerate(antibiotics)])
 
-        # Write the file header
-        output = StringIO()
+        # The file header
         header = [
             "Hospital",
             "Medical record number",
@@ -228,28 +343,16 @@ class WHONETExportView(BrowserView):
             "Current antibiotics",
             "Microorganism",
         ]
+        header.extend(self.titles.get_titles(antibiotics))
+        yield header
 
-        header.extend(antibiotics_titles)
-
-        def wrap_quotes(value):
-            if not value:
-                value = ""
-            val = str(value).replace('"', '\'')
-            return '"{}"'.format(val)
-
-        # Wrap values in double-quotes
-        header = map(wrap_quotes, header)
-        output.write(delimiter.join(header)+"\r\n")
-
-        # Iterate over analyses and build the data lines
-        for analysis in analyses:
+        # Iterate over records and build the data lines
+        for sample_info, microorganism, results in records:
 
             # Initialize the data line
             data_line = []
 
             # Extend the data line with the sample info
-            sample = analysis.getRequest()
-            sample_info = self.get_sample_info(sample)
             data_line.extend([
                 sample_info["client"],
                 sample_info["mrn"],
@@ -267,54 +370,25 @@ class WHONETExportView(BrowserView):
                 sample_info["antibiotics"],
             ])
 
-            # Default values for when analysis is not a zone-size
-            microorganism = "no growth"
-            results = [""]*len(antibiotics)
-            if analysis.getKeyword() not in skip:
-                # Append the microorganism name (is the ShortTitle)
-                microorganism = analysis.getShortTitle()
-
-                # Extend with the diameter (mmg) result per antibiotic
-                results = []
-                for antibiotic in antibiotics:
-                    # Get the result for this analysis and antibiotic
-                    result = self.get_result_for(analysis, antibiotic)
-                    results.append(result)
+            # Extend with the diameter (mm) result per antibiotic
+            values = [""] * len(antibiotics)
+            for uid, value in results.items():
+                if uid in offsets:
+                    values[offsets[uid]] = value
 
             data_line.append(microorganism)
-            map(data_line.append, results)
-
-            # Wrap values in double-quotes
-            data_line = map(wrap_quotes, data_line)
-            output.write(delimiter.join(data_line)+"\r\n")
-
-        output.seek(0)
-
-        # Get the raw data and close the stream
-        data = output.getvalue()
-        output.close()
-
-        return data
-
-    def get_result_for(self, analysis, antibiotic):
-        """Extracts the result for the analysis and antibiotic passed in, if
-        any. Returns None otherwise
-        """
-        antibiotic_uid = api.get_uid(antibiotic)
-        for result in analysis.getInterimFields():
-            if result.get("uid") == antibiotic_uid:
-                return result.get("value", "")
-
-        return ""
+            data_line.extend(values)
+            yield data_line
 
     def get_age_ymd(self, dob, date_sampled):
         return patient_api.get_age_ymd(dob, date_sampled) or ""
 
     def get_ward(self, sample):
         # TODO Remove after Wards are ported to bes.lims
-        accessor = getattr(sample, "getWard", None)
-        if callable(accessor):
-            return accessor()
+        for name in ("getRawWard", "getWard"):
+            accessor = getattr(sample, name, None)
+            if callable(accessor):
+                return accessor()
         return None
 
     def get_sample_info(self, sample):
@@ -323,7 +397,7 @@ class WHONETExportView(BrowserView):
         mrn = sample.getMedicalRecordNumberValue()
         dob = sample.getDateOfBirth()[0]
 
-        client = sample.getClient()
+        client = sample.getClientUID()
         sample_type = sample.getRawSampleType()
         date_sampled = sample.getDateSampled()
         date_received = sample.getDateReceived()
@@ -331,17 +405,16 @@ class WHONETExportView(BrowserView):
         # XXX Port CurrentAntibiotics functionality from kiribati/palau/...
         antibiotics = get_field_value(sample, "CurrentAntibiotics")
         antibiotics = antibiotics or []
-        antibiotics = ", ".join(map(api.get_title, antibiotics))
+        antibiotics = ", ".join(self.titles.get_titles(antibiotics))
 
         patient_field = sample.getField("PatientFullName")
         firstname = patient_field.get_firstname(sample)
         lastname = patient_field.get_lastname(sample)
 
-        ward = self.get_ward(sample)
-        ward = api.get_title(ward) if ward else ""
+        ward = self.titles.get(self.get_ward(sample))
 
         return {
-            "client": api.get_title(client),
+            "client": self.titles.get(client),
             "mrn": mrn,
             "patient_firstname": firstname,
             "patient_lastname": lastname,
@@ -357,14 +430,10 @@ class WHONETExportView(BrowserView):
             "antibiotics": antibiotics,
         }
 
-    @memoize
     def get_title(self, uid, default=""):
         """Returns the title of the object with the uid passed in
         """
-        obj = api.get_object_by_uid(uid, default=None)
-        if not obj:
-            return default
-        return api.get_title(obj)
+        return self.titles.get(uid, default=default)
 
     def format_date(self, date_obj, default=""):
         if not dtime.is_date(date_obj):
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from collections import OrderedDict
+
+from bes.lims import messageFactory as _
+from Products.CMFPlone.utils import safe_unicode
+
+# Line terminator expected by BacLink
+EOL = u"\r\n"
+
+# Supported output formats: id -> (title, file extension, content type)
+FORMATS = OrderedDict((
+    ("csv", (_("Comma-separated (quoted)"), "csv", "text/csv")),
+    ("tab", (_("Tab-delimited"), "txt", "text/tab-separated-values")),
+    ("fixed", (_("Fixed-width"), "txt", "text/plain")),
+))
+
+# Supported encodings of the output: id -> title
+ENCODINGS = OrderedDict((
+    ("utf-8", _("UTF-8")),
+    ("windows-1252", _("Windows-1252 (ANSI)")),
+))
+
+DEFAULT_FORMAT = "csv"
+DEFAULT_ENCODING = "utf-8"
+
+
+def to_text(value):
+    """Returns the value passed-in as a unicode string
+    """
+    if not value:
+        return u""
+    if isinstance(value, basestring):
+        return safe_unicode(value)
+    return safe_unicode(str(value))
+
+
+def quote(value):
+    """Returns the value wrapped in double-quotes, with the double-quotes it
+    might contain replaced by single quotes
+    """
+    return u'"{}"'.format(to_text(value).replace(u'"', u"'"))
+
+
+def flatten(value):
+    """Returns the value as a single-line text without tabs
+    """
+    value = to_text(value)
+    for char in (u"\r\n", u"\r", u"\n", u"\t"):
+        value = value.replace(char, u" ")
+    return value
+
+
+def get_widths(lines):
+    """Returns the maximum width of each column from the lines passed-in
+    """
+    widths = []
+    for line in lines:
+        values = map(flatten, line)
+        missing = len(values) - len(widths)
+        if missing > 0:
+            widths.extend([0] * missing)
+        for pos, value in enumerate(values):
+            widths[pos] = max(widths[pos], len(value))
+    return widths
+
+
+def format_csv(line, widths=None):
+    return u",".join(map(quote, line))
+
+
+def format_tab(line, widths=None):
+    return u"\t".join(map(flatten, line))
+
+
+def format_fixed(line, widths):
+    values = map(flatten, line)
+    values = [value.ljust(width) for value, width in zip(values, widths)]
+    return u" ".join(values)
+
+
+FORMATTERS = {
+    "csv": format_csv,
+    "tab": format_tab,
+    "fixed": format_fixed,
+}
+
+
+def write(lines, output, fmt=DEFAULT_FORMAT, encoding=DEFAULT_ENCODING,
+          widths=None):
+    """Writes the lines passed-in to the file-like output one by one, in the
+    format and encoding specified. Characters that cannot be represented in
+    the given encoding are replaced. The widths of the columns are required
+    for the fixed-width format. Returns the number of lines written
+    """
+    formatter = FORMATTERS[fmt]
+    if fmt == "fixed" and widths is None:
+        raise ValueError("Column widths are required for fixed-width format")
+
+    num = 0
+    for line in lines:
+        line = formatter(line, widths) + EOL
+        output.write(line.encode(encoding, "replace"))
+        num += 1
+    return num
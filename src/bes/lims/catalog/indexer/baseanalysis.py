@@ -18,8 +18,12 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from bes.lims.utils import get_analysis_date_changed
 from bika.lims.interfaces import IBaseAnalysis
+from bika.lims.interfaces import IInternalUse
 from plone.indexer import indexer
+from senaite.ast.config import RESISTANCE_KEY
+from senaite.ast.utils import is_ast_analysis
 from senaite.core.api import dtime
 from senaite.core.interfaces import IAnalysisCatalog
 
@@ -37,3 +41,30 @@ def date_verified(instance):
     """
     dt = instance.getDateVerified()
     return dtime.to_DT(dt)
+
+
+@indexer(IBaseAnalysis, IAnalysisCatalog)
+def date_changed(instance):
+    """Returns the date (as DateTime) of the last change of the instance or
+    its sample, either an edition or a workflow transition
+    """
+    return get_analysis_date_changed(instance)
+
+
+@indexer(IBaseAnalysis, IAnalysisCatalog)
+def report_hidden(instance):
+    """Returns whether the instance is not displayed in results reports,
+    either because it is hidden, for internal use or an AST analysis other
+    than the resistance category. Returns None when it depends on the
+    settings of the sample, that can change without the instance being
+    reindexed, so the object has to be checked instead
+    """
+    if IInternalUse.providedBy(instance):
+        return True
+    if is_ast_analysis(instance) and instance.getKeyword() != RESISTANCE_KEY:
+        return True
+    manually = getattr(instance, "getHiddenManually", None)
+    if manually and not manually():
+        # visibility from the settings of the sample, template or profiles
+        return None
+    return bool(instance.getHidden())
@@ -18,27 +18,18 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
-from bika.lims import api
+from bes.lims.utils import get_department_uids
 from bika.lims.interfaces import IAnalysisRequest
 from plone.indexer import indexer
 from senaite.core.interfaces import ISampleCatalog
 
-DETACHED_STATES = ["cancelled", "rejected", "retracted"]
-
 
 @indexer(IAnalysisRequest, ISampleCatalog)
 def department_uid(instance):
     """Returns the department uids assigned to the analyses that belong to this
     sample (instance). If no department assigned, it returns a list with an
-    empty value to allow searches for `MissingValue`.
+    empty value to allow searches for `MissingValue`. The departments are kept
+    up-to-date in the sample on analysis events, so analyses are not loaded
     """
-    uids = set()
-    for obj in instance.objectValues(spec="Analysis"):
-        if api.get_review_status(obj) in DETACHED_STATES:
-            continue
-        uid = obj.getRawDepartment()
-        if not api.is_uid(uid):
-            continue
-        uids.add(uid)
-
+    uids = get_department_uids(instance)
     return list(uids) if uids else [""]
@@ -30,6 +30,16 @@ ANALYSIS_REPORTABLE_STATUSES = (
     "out_of_stock",
 )
 
+# Statuses of analyses that do not count for the departments of the sample
+ANALYSIS_DETACHED_STATUSES = (
+    "cancelled",
+    "rejected",
+    "retracted",
+)
+
+# Key of the sample annotation that keeps the departments of its analyses
+SAMPLE_DEPARTMENTS_STORAGE = "bes.lims.sample.departments"
+
 MONTHS = {
     1: _("January"),
     2: _("February"),
@@ -59,3 +69,9 @@ DATE_TYPES = DisplayList((
     ("getDateVerified", _("Date Verified")),
     ("getDatePublished", _("Date Published")),
 ))
+
+# Annotation key of the portal where background report jobs are stored
+REPORT_JOBS_STORAGE = "bes.lims.reports.jobs.storage"
+
+# Number of days the results of background report jobs are kept
+REPORT_JOBS_EXPIRY_DAYS = 7
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from bes.lims.impress.publisher import Publisher
+from senaite.impress.ajax import AjaxPublishView as BaseView
+
+# Stylesheets linked by senaite.impress' publisher, in the same order
+CSS_FILES = ("bootstrap.min.css", "bootstrap-print.css", "print.css")
+
+
+class AjaxPublishView(BaseView):
+    """Publish View with Ajax exposed methods that renders the PDFs of the
+    reports in parallel, when enabled
+    """
+
+    @property
+    def publisher(self):
+        """Provides a configured publisher instance, that renders the PDFs of
+        all the reports at once
+        """
+        publisher = Publisher()
+        for css_file in CSS_FILES:
+            publisher.link_css_file(css_file)
+        return publisher
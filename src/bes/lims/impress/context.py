@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from collections import defaultdict
+
+from bes.lims.utils import is_reportable
+from bika.lims import api
+from zope.annotation.interfaces import IAnnotations
+
+# Key of the request annotation where the report contexts are stored
+REQUEST_KEY = "bes.lims.impress.report_contexts"
+
+# Statuses of partitions that are not displayed in results reports
+SKIP_PARTITION_STATUSES = (
+    "cancelled",
+    "invalid",
+    "rejected",
+    "stored",
+    "dispatched",
+)
+
+# Statuses of the analyses that were once verified
+VERIFIED_STATUSES = ("published", "verified")
+
+# Statuses of the analyses that were once submitted
+SUBMITTED_STATUSES = ("published", "verified", "to_be_verified")
+
+
+def get_report_context(sample):
+    """Returns the report context of the sample passed-in. The context is
+    stored in the current request, so it is shared by all the views and
+    templates that render the report of the sample
+    """
+    uid = api.get_uid(sample)
+    request = api.get_request()
+    if request is None:
+        return ReportContext(sample)
+
+    annotations = IAnnotations(request)
+    contexts = annotations.get(REQUEST_KEY)
+    if contexts is None:
+        contexts = {}
+        annotations[REQUEST_KEY] = contexts
+
+    context = contexts.get(uid)
+    if context is None:
+        context = ReportContext(sample)
+        contexts[uid] = context
+    return context
+
+
+def get_last_actions(obj, action_ids):
+    """Returns a dict of action id -> (actor, date) with the last time each
+    of the actions passed-in took place for the object, reading the review
+    history only once
+    """
+    actions = {}
+    for event in api.get_review_history(obj, rev=True):
+        action = event.get("action")
+        if action not in action_ids or action in actions:
+            continue
+        actions[action] = (event.get("actor"), event.get("time"))
+        if len(actions) == len(action_ids):
+            break
+    return actions
+
+
+class ReportContext(object):
+    """Data required to render the results report of a sample, that is
+    computed in a single pass. The analyses of the sample and its partitions
+    are loaded only once and the rest is derived from them
+    """
+
+    def __init__(self, sample):
+        self.sample = api.get_object(sample)
+        self._analyses = None
+        self._descendants = None
+        self._children = None
+        self._partitions = None
+        self._actions = None
+
+    @property
+    def descendants(self):
+        """All partitions of the sample, partitions of partitions included
+        """
+        if self._descendants is None:
+            self._descendants = self.sample.getDescendants(
+                all_descendants=True)
+        return self._descendants
+
+    def get_children(self, sample):
+        """Returns the direct partitions of the sample or partition passed-in
+        """
+        if self._children is None:
+            self._children = defaultdict(list)
+            for partition in self.descendants:
+                parent = partition.getRawParentAnalysisRequest()
+                self._children[parent].append(partition)
+        return self._children.get(api.get_uid(sample), [])
+
+    def get_own_analyses(self, sample):
+        """Returns the analyses contained in the sample or partition
+        passed-in, without those from its partitions
+        """
+        if self._analyses is None:
+            self._analyses = {}
+        uid = api.get_uid(sample)
+        analyses = self._analyses.get(uid)
+        if analyses is None:
+            analyses = sample.objectValues("Analysis")
+            self._analyses[uid] = analyses
+        return analyses
+
+    def get_analyses(self, sample=None):
+        """Returns the analyses of the sample or partition passed-in, along
+        with the analyses from its partitions
+        """
+        sample = sample or self.sample
+        analyses = list(self.get_own_analyses(sample))
+        for partition in self.get_children(sample):
+            analyses.extend(self.get_analyses(partition))
+        return analyses
+
+    def has_reportable_analyses(self, sample, own=False):
+        """Returns whether the sample or partition passed-in has analyses in
+        a reportable status. If own, analyses from partitions are not checked
+        """
+        if own:
+            analyses = self.get_own_analyses(sample)
+        else:
+            analyses = self.get_analyses(sample)
+        return any(map(is_reportable, analyses))
+
+    @property
+    def partitions(self):
+        """Partitions of the sample that are undergoing and have analyses in
+        a reportable status
+        """
+        if self._partitions is None:
+            self._partitions = []
+            for partition in self.descendants:
+                status = api.get_review_status(partition)
+                if status in SKIP_PARTITION_STATUSES:
+                    continue
+                if not self.has_reportable_analyses(partition):
+                    continue
+                self._partitions.append(partition)
+        return self._partitions
+
+    def get_ancestry(self):
+        """Returns the whole lineage of primaries of the sample, along with
+        the sample itself if it contains reportable analyses and the
+        undergoing partitions
+        """
+        primaries = []
+        primary = self.sample.getPrimaryAnalysisRequest()
+        while primary:
+            primaries.append(primary)
+            primary = primary.getPrimaryAnalysisRequest()
+
+        # reverse them so the first primary is the oldest
+        samples = list(reversed(primaries))
+
+        # if a retest, append the original
+        invalidated = self.sample.getInvalidated()
+        if invalidated:
+            samples.append(invalidated)
+
+        # extend with current only if it contains "valid" tests
+        if self.has_reportable_analyses(self.sample, own=True):
+            samples.append(self.sample)
+
+        # extend with partitions
+        samples.extend(self.partitions)
+        return samples
+
+    def get_actions(self):
+        """Returns a list of tuples (action_id, actor, date) with the last
+        submission and verification of the sample, partitions and analyses
+        """
+        if self._actions is not None:
+            return self._actions
+
+        all_actions = ("submit", "verify")
+        items = [(sample, all_actions) for sample in
+                 [self.sample] + self.partitions]
+
+        # only the valid analyses that were once submitted or verified
+        for analysis in self.get_analyses():
+            status = api.get_review_status(analysis)
+            if status in VERIFIED_STATUSES:
+                items.append((analysis, all_actions))
+            elif status in SUBMITTED_STATUSES:
+                items.append((analysis, ("submit", )))
+
+        self._actions = []
+        for item, action_ids in items:
+            actions = get_last_actions(item, action_ids)
+            for action_id, (actor, date) in actions.items():
+                if all([actor, date]):
+                    self._actions.append((action_id, actor, date))
+        return self._actions
+
+    def get_actors(self, action_id):
+        """Returns a dict where the keys are the usernames of the persons that
+        performed the action and the values the last date they did it
+        """
+        actors = {}
+        for action, actor, date in self.get_actions():
+            if action != action_id:
+                continue
+            last_date = actors.get(actor)
+            if not last_date or date > last_date:
+                actors[actor] = date
+        return actors
+
+    @property
+    def verifiers(self):
+        """Usernames of the verifiers with the last verification date
+        """
+        return self.get_actors("verify")
+
+    @property
+    def submitters(self):
+        """Usernames of the submitters with the last submission date
+        """
+        return self.get_actors("submit")
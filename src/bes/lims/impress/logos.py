@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import threading
+
+from weasyprint.compat import base64_encode
+
+# Encoded logos, keyed by the identity of the blob. Each value is a tuple
+# (version, data_url), so there is only one entry per blob and the entry is
+# replaced when the blob is modified
+LOGOS = {}
+LOGOS_LOCK = threading.Lock()
+
+
+def get_blob_key(img):
+    """Returns a tuple (identity, version) for the image blob passed-in, or
+    None if the image is not persistent
+    """
+    oid = getattr(img, "_p_oid", None)
+    if not oid:
+        return None
+    # ensure the modification time is loaded for ghosts
+    img._p_activate()
+    return oid, img._p_mtime
+
+
+def get_data_url(img):
+    """Returns the data URL of the image passed-in. The base64-encoding is
+    done only once per version of the image blob
+    """
+    key = get_blob_key(img)
+    if key:
+        oid, version = key
+        cached = LOGOS.get(oid)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    data_url = "data:" + img.content_type + ";base64," + (
+        base64_encode(img.data).decode("ascii").replace("\n", ""))
+    if key:
+        with LOGOS_LOCK:
+            LOGOS[oid] = (version, data_url)
+    return data_url
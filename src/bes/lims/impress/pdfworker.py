@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Renders PDFs with WeasyPrint out of the Zope process.
+
+Executed as a script by the publisher, so it does not import any module from
+the instance. It reads a pickled dict with the htmls to render, along with the
+stylesheets and resources they refer to, from stdin and writes the pickled
+list of PDFs to stdout
+"""
+
+import sys
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+def render_pdf(html, stylesheets, resources, base_url):
+    """Renders the html as a PDF, with the resources passed-in only
+    """
+    from weasyprint import CSS
+    from weasyprint import HTML
+    from weasyprint import default_url_fetcher
+
+    def url_fetcher(url):
+        if url in resources:
+            return dict(resources[url])
+        if url.startswith("data"):
+            return default_url_fetcher(url)
+        raise ValueError("Resource not available: %s" % url)
+
+    css = [CSS(string=string, base_url=url, url_fetcher=url_fetcher)
+           for url, string in stylesheets]
+    html = HTML(string=html, base_url=base_url, url_fetcher=url_fetcher)
+    return html.render(stylesheets=css).write_pdf()
+
+
+def main():
+    job = pickle.load(sys.stdin)
+    pdfs = [render_pdf(html, job["stylesheets"], job["resources"],
+                       job["base_url"]) for html in job["htmls"]]
+    pickle.dump(pdfs, sys.stdout, pickle.HIGHEST_PROTOCOL)
+
+
+if __name__ == "__main__":
+    main()
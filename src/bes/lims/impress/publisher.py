@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import os
+
+from bes.lims.impress import rendering
+from senaite.impress.publisher import Publisher as BasePublisher
+
+
+class Publisher(BasePublisher):
+    """Publisher that renders the PDFs of all the reports parsed at once, in
+    parallel processes when enabled (see rendering.WORKERS_ENV)
+    """
+
+    def __init__(self):
+        super(Publisher, self).__init__()
+        self.css_files = []
+        self.inline_css = []
+        self.reports = []
+        self.pdfs = {}
+
+    def link_css_file(self, css_file):
+        super(Publisher, self).link_css_file(css_file)
+        self.css_files.append(os.path.basename(css_file))
+
+    def add_inline_css(self, css):
+        super(Publisher, self).add_inline_css(css)
+        self.inline_css.append(css)
+
+    def parse_reports(self, html):
+        reports = super(Publisher, self).parse_reports(html)
+        # the PDFs of these reports are rendered on first write_pdf call
+        self.reports = reports
+        self.pdfs = {}
+        return reports
+
+    def write_pdf(self, html):
+        if self.reports:
+            self.render_reports()
+        pdf = self.pdfs.pop(html, None)
+        if pdf is None:
+            return super(Publisher, self).write_pdf(html)
+        return pdf
+
+    def render_reports(self):
+        """Renders the PDFs of the parsed reports at once
+        """
+        reports, self.reports = self.reports, []
+        if len(reports) < 2 or rendering.get_workers() < 2:
+            # rendered serially, on demand
+            return
+        htmls = map(self.to_html, reports)
+        pdfs = rendering.render_pdfs(self, htmls)
+        if pdfs:
+            self.pdfs = dict(zip(htmls, pdfs))
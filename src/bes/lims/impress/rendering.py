@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import os
+import re
+import subprocess
+import sys
+import threading
+from urlparse import urljoin
+
+from bes.lims import logger
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Environment variable that sets the number of processes to render the PDFs
+# of a multi-report publish with. PDFs are rendered serially unless set to a
+# value greater than 1
+WORKERS_ENV = "BES_LIMS_PDF_WORKERS"
+
+# Max number of seconds a process is given to render its PDFs. The process is
+# killed afterwards and the PDFs are rendered serially
+WORKER_TIMEOUT = 600
+
+# Script the processes that render the PDFs run. Processes are started with
+# this script from scratch, so they do not inherit the state of the instance
+# (database connections, locks, etc.)
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "pdfworker.py")
+
+# Matches the urls of resources referred in html and css
+URL_RX = re.compile(r"""(?:src|href)\s*=\s*["']([^"']+)["']"""
+                    r"""|url\(\s*["']?([^"')]+?)["']?\s*\)""")
+
+
+def get_workers():
+    """Returns the number of processes to render the PDFs with
+    """
+    workers = os.environ.get(WORKERS_ENV)
+    if not workers:
+        return 1
+    try:
+        return int(workers)
+    except ValueError:
+        logger.warn("Invalid value for %s: %s" % (WORKERS_ENV, workers))
+        return 1
+
+
+def get_urls(text, base_url):
+    """Returns the absolute urls of the resources referred in the html or css
+    """
+    urls = set()
+    for match in URL_RX.finditer(text or ""):
+        url = (match.group(1) or match.group(2) or "").strip()
+        if not url or url.startswith(("data:", "#", "mailto:", "javascript:")):
+            continue
+        urls.add(urljoin(base_url, url))
+    return urls
+
+
+def fetch(publisher, url):
+    """Fetches the resource with publisher's url fetcher and returns a dict
+    that can be sent to a worker process. Returns None if not fetched
+    """
+    try:
+        resource = publisher.url_fetcher(url)
+    except Exception as e:
+        logger.warn("Cannot fetch %s: %r" % (url, e))
+        return None
+
+    resource = dict(resource)
+    file_obj = resource.pop("file_obj", None)
+    if file_obj is not None:
+        resource["string"] = file_obj.read()
+        file_obj.close()
+    return resource
+
+
+def get_stylesheets(publisher):
+    """Returns a list of tuples (base_url, css) with the stylesheets the
+    publisher renders the reports with
+    """
+    stylesheets = []
+    for css_file in publisher.css_files:
+        url = "{}/{}/{}".format(publisher.base_url, publisher.css_resources,
+                                css_file)
+        resource = fetch(publisher, url)
+        if resource:
+            stylesheets.append((url, resource.get("string")))
+    for css in publisher.inline_css:
+        stylesheets.append((publisher.base_url, css))
+    return stylesheets
+
+
+def get_resources(publisher, htmls, stylesheets):
+    """Prefetches the resources referred in the reports and stylesheets, so
+    they can be rendered without access to the database
+    """
+    urls = set()
+    for html in htmls:
+        urls.update(get_urls(html, publisher.base_url))
+    for base_url, css in stylesheets:
+        urls.update(get_urls(css, base_url))
+
+    resources = {}
+    for url in urls:
+        resource = fetch(publisher, url)
+        if resource:
+            resources[url] = resource
+    return resources
+
+
+def get_worker_env():
+    """Returns the environment for the processes that render the PDFs, with
+    the same python path as the instance so WeasyPrint can be imported
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, sys.path))
+    return env
+
+
+def run_worker(job, results, index):
+    """Renders the PDFs of the job in a new process and stores them in the
+    results list at the index passed-in. The process is killed if it does not
+    finish within WORKER_TIMEOUT seconds
+    """
+    process = subprocess.Popen([sys.executable, WORKER_SCRIPT],
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               close_fds=True,
+                               env=get_worker_env())
+    timer = threading.Timer(WORKER_TIMEOUT, process.kill)
+    timer.start()
+    try:
+        out, err = process.communicate(
+            pickle.dumps(job, pickle.HIGHEST_PROTOCOL))
+    finally:
+        timer.cancel()
+
+    if process.returncode != 0:
+        logger.error("PDF rendering process failed with code %s: %s"
+                     % (process.returncode, err))
+        return
+    results[index] = pickle.loads(out)
+
+
+def render_pdfs(publisher, htmls):
+    """Returns the PDFs of the htmls passed-in, in the same order, rendered in
+    parallel by as many processes as workers set. Returns None if parallel
+    rendering is not enabled or failed, so PDFs have to be rendered serially
+    """
+    workers = min(get_workers(), len(htmls))
+    if workers < 2:
+        return None
+
+    # the resources are fetched here, processes have no access to database
+    stylesheets = get_stylesheets(publisher)
+    resources = get_resources(publisher, htmls, stylesheets)
+
+    logger.info("Rendering %s PDFs with %s processes ..."
+                % (len(htmls), workers))
+    chunks = [htmls[num::workers] for num in range(workers)]
+    results = [None] * workers
+    threads = []
+    for num, chunk in enumerate(chunks):
+        job = {
+            "htmls": chunk,
+            "stylesheets": stylesheets,
+            "resources": resources,
+            "base_url": publisher.base_url,
+        }
+        thread = threading.Thread(target=run_worker, args=(job, results, num))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    if None in results:
+        logger.error("Parallel rendering of PDFs failed, rendering them "
+                     "serially")
+        return None
+
+    # restore the original order
+    pdfs = [None] * len(htmls)
+    for num, chunk in enumerate(results):
+        pdfs[num::workers] = chunk
+    return pdfs
@@ -20,17 +20,17 @@
 
 import collections
 import copy
-import json
 from collections import OrderedDict
 
+from bes.lims.impress.context import get_report_context
+from bes.lims.impress.logos import get_data_url
+from bes.lims.resultoptions import format_result
 from bes.lims.utils import is_reportable
 from bika.lims import api
 from bika.lims.api import mail
 from bika.lims.workflow import getTransitionActor
 from bika.lims.workflow import getTransitionDate
 from plone.memoize import view
-from senaite.ast.config import IDENTIFICATION_KEY
-from senaite.ast.config import RESISTANCE_KEY
 from senaite.ast.utils import is_ast_analysis
 from senaite.core.api import dtime
 from senaite.core.p3compat import cmp
@@ -39,7 +39,6 @@ from senaite.impress.decorators import returns_super_model
 from senaite.patient import api as patient_api
 from senaite.patient.config import SEXES
 from senaite.patient.i18n import translate as patient_translate
-from weasyprint.compat import base64_encode
 
 
 class DefaultReportView(SingleReportView):
@@ -78,9 +77,7 @@ class DefaultReportView(SingleReportView):
         """
         if not img:
             return None
-        data_url = "data:"+img.content_type+";base64," + (
-            base64_encode(img.data).decode("ascii").replace("\n", ""))
-        return data_url
+        return get_data_url(img)
 
     def get_email_address(self, contact):
         """Returns the email address of the contact as a pair format
@@ -125,6 +122,12 @@ class DefaultReportView(SingleReportView):
         sex = dict(SEXES).get(sex, "")
         return patient_translate(sex)
 
+    def get_report_context(self, model):
+        """Returns the precomputed data of the sample passed-in, shared by all
+        the views and templates that render its report within the request
+        """
+        return get_report_context(model)
+
     def get_analyses(self, model_or_collection, parts=False):
         """Returns a flat list of all analyses for the given model or
         collection, but only those in a "reportable" status are returned.
@@ -166,38 +169,7 @@ class DefaultReportView(SingleReportView):
         """Returns the whole lineage of primaries of the model passed-in,
         along with the model itself
         """
-        def get_primaries(sample, primaries=None):
-            if primaries is None:
-                primaries = []
-            primary = sample.getPrimaryAnalysisRequest()
-            if primary:
-                primaries.append(primary)
-                return get_primaries(primary, primaries=primaries)
-            return primaries
-
-        # Extract all primaries of this sample
-        samples = get_primaries(model)
-
-        # Reverse them so the first primary is the oldest
-        samples = list(reversed(samples))
-
-        # If a retest, append the original
-        invalidated = model.getInvalidated()
-        if invalidated:
-            samples.append(invalidated)
-
-        # extend with current only if it contains "valid" tests
-        sample = api.get_object(model)
-        analyses = sample.objectValues("Analysis")
-        analyses = filter(is_reportable, analyses)
-        if analyses:
-            samples.append(sample)
-
-        # Extend with partitions
-        parts = self.get_undergoing_partitions(sample)
-        samples.extend(parts)
-
-        return samples
+        return self.get_report_context(model).get_ancestry()
 
     def get_analyses_by_category(self, model_or_collection, parts=False):
         """Return analyses grouped by category. If "parts" is False, analyses
@@ -209,92 +181,11 @@ class DefaultReportView(SingleReportView):
     def get_formatted_result(self, sample_model, analysis):
         """Returns the result of the analysis properly formatted
         """
-        if analysis.getKeyword() == RESISTANCE_KEY:
-            # Return the result with the Sensitivity Category R/S/I prefixed
-            result = analysis.getResult()
-
-            # Extract the values and texts from result options
-            choices = analysis.getResultOptions()
-
-            # Set the category (R/I/S) as prefix
-            def prefix_category(val):
-                if ": " not in val:
-                    return val
-                idx = val.rindex(": ")
-                category = val[idx+2:]
-                if not category:
-                    category = "?"
-                return "{}: {}".format(category, val[:idx])
-
-            choices_texts = map(lambda c: str(c["ResultText"]), choices)
-            choices_texts = map(prefix_category, choices_texts)
-
-            # Create a dict for easy mapping of result options
-            choices_values = map(lambda c: str(c["ResultValue"]), choices)
-            values_texts = dict(zip(choices_values, choices_texts))
-
-            # Result might contain a single result option
-            match = values_texts.get(str(result))
-            if match:
-                return match
-
-            # Result is a string with multiple options e.g. "['2', '1']"
-            try:
-                raw_result = json.loads(result)
-                texts = map(lambda r: values_texts.get(str(r)), raw_result)
-                texts = filter(None, texts)
-                return "<br/>".join(texts)
-            except (ValueError, TypeError):
-                pass
-
-        if analysis.getKeyword() == IDENTIFICATION_KEY:
-            # Display the growth number next to each microorganism
-            interims = analysis.getInterimFields()
-            growth = filter(lambda it: it.get("keyword") == "growth", interims)
-            try:
-                growth = growth and growth[0] or {}
-                growth = json.loads(growth.get("value"))
-            except (ValueError, TypeError):
-                growth = []
-
-            growth = growth or [""]
-
-            # Raw result
-            result = analysis.getResult()
-
-            # Extract the values and texts from result options
-            choices = analysis.getResultOptions()
-            choices_texts = map(lambda c: str(c["ResultText"]), choices)
-
-            # Create a dict for easy mapping of result options
-            choices_values = map(lambda c: str(c["ResultValue"]), choices)
-            values_texts = dict(zip(choices_values, choices_texts))
-
-            # Result might contain a single result option
-            match = values_texts.get(str(result))
-            if match:
-                if growth:
-                    return "#{} {}".format(growth[0], match)
-
-            # prepend '#' to growth numbers
-            def prepend_hash(val):
-                val = str(val).strip()
-                if not val:
-                    return ""
-                return "#{}".format(val)
-            growth = [prepend_hash(gr) for gr in growth]
-
-            # Result is a string with multiple options e.g. "['2', '1']"
-            try:
-                raw_result = json.loads(result)
-                texts = map(lambda r: values_texts.get(str(r)), raw_result)
-                # extend growth list to have same length as texts
-                growth = growth + [""]*(len(texts)-len(growth))
-                texts = zip(growth, texts)
-                texts = [" ".join(text) for text in texts]
-                return "<br/>".join(texts)
-            except (ValueError, TypeError):
-                pass
+        # Resistance with the Sensitivity Category R/S/I prefixed and
+        # identification with the growth number next to each microorganism
+        result = format_result(analysis, separator="<br/>")
+        if result is not None:
+            return result
 
         # Delegate to 'standard' formatted result resolver
         return sample_model.get_formatted_result(analysis)
@@ -429,65 +320,19 @@ class DefaultReportView(SingleReportView):
         statuses = ["published", "verified", "to_be_verified"]
         return model.getAnalyses(full_objects=True, review_state=statuses)
 
-    @view.memoize
     def get_verifiers(self, model):
         """Returns a dictionary where the keys are the username of the person
         who verified the sample, partitions or analyses and the value is the
         last verification date performed by the user
         """
-        # get the verifier and date from the sample
-        sample = api.get_object(model)
-
-        # get the verifiers and dates from partitions
-        partitions = self.get_undergoing_partitions(sample)
-
-        # get the verifiers and dates from analyses
-        analyses = self.get_verified_analyses(sample)
-
-        # extract the verifiers and dates
-        verifiers = {}
-        items = [sample] + partitions + analyses
-        for item in items:
-            verifier = self.get_action_user(item, "verify")
-            verified = self.get_action_date(item, "verify")
-            if not all([verifier, verified]):
-                continue
+        return self.get_report_context(model).verifiers
 
-            last_verified = verifiers.get(verifier)
-            if not last_verified or verified > last_verified:
-                verifiers[verifier] = verified
-
-        return verifiers
-
-    @view.memoize
     def get_submitters(self, model):
         """Returns a dictionary where the keys are the username of the person
         who submitted the sample, partitions or analyses and the value is the
         last submission date performed by the user
         """
-        # get the submitter and date from the sample
-        sample = api.get_object(model)
-
-        # get the submitters and dates from partitions
-        partitions = self.get_undergoing_partitions(sample)
-
-        # get the submitters and dates from analyses
-        analyses = self.get_submitted_analyses(sample)
-
-        # extract the submitters and dates
-        submitters = {}
-        items = [sample] + partitions + analyses
-        for item in items:
-            submitter = self.get_action_user(item, "submit")
-            submitted = self.get_action_date(item, "submit")
-            if not all([submitter, submitted]):
-                continue
-
-            last_submitted = submitters.get(submitter)
-            if not last_submitted or submitted > last_submitted:
-                submitters[submitter] = submitted
-
-        return submitters
+        return self.get_report_context(model).submitters
 
     def get_submitters_info(self, model):
         """Returns a list made of dicts representing the LabContacts (or users)
@@ -560,25 +405,10 @@ class DefaultReportView(SingleReportView):
         obj = api.get_object(model)
         return getTransitionDate(obj, action_id, return_as_datetime=True)
 
-    @view.memoize
     def get_undergoing_partitions(self, sample):
         """Returns the partitions of the sample that are undergoing
         """
-        partitions = []
-        skip = ["cancelled", "invalid", "rejected", "stored", "dispatched"]
-        for partition in sample.getDescendants(all_descendants=True):
-            # skip partitions that are not in a valid status
-            if api.get_review_status(partition) in skip:
-                continue
-
-            # do not include partitions without "valid" tests
-            analyses = partition.getAnalyses(full_objects=True)
-            analyses = filter(is_reportable, analyses)
-            if not analyses:
-                continue
-
-            partitions.append(partition)
-        return partitions
+        return self.get_report_context(sample).partitions
 
     @view.memoize
     def is_provisional(self, model):
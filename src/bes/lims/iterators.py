@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+import os
+import tempfile
+
+from ZPublisher.Iterators import IStreamIterator
+from zope.interface import implementer
+
+# Size of the chunks read from the temporary file on streaming
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+@implementer(IStreamIterator)
+class TemporaryFileIterator(object):
+    """Stream iterator that serves the contents of a temporary file in chunks
+    and closes (thus removes) the file once fully consumed
+    """
+
+    def __init__(self, fileobj, chunk_size=STREAM_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.fileobj.seek(0, os.SEEK_END)
+        self.size = self.fileobj.tell()
+        self.fileobj.seek(0)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        data = self.fileobj.read(self.chunk_size)
+        if not data:
+            self.fileobj.close()
+            raise StopIteration
+        return data
+
+    __next__ = next
+
+    def __len__(self):
+        return self.size
+
+
+def get_temporary_file():
+    """Returns a temporary file object suitable for streaming, that is
+    removed from the filesystem as soon as it is closed
+    """
+    return tempfile.TemporaryFile(prefix="bes.lims-", suffix=".tmp")
@@ -18,9 +18,11 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+import time
 from datetime import datetime
 
 from bes.lims.config import TARGET_PATIENTS
+from bes.lims.reports import profiler
 from bes.lims.utils import get_field_value
 from bes.lims.utils import get_file_resource
 from bes.lims.utils import read_csv
@@ -31,6 +33,16 @@ from senaite.core.catalog import ANALYSIS_CATALOG
 from senaite.core.catalog import SAMPLE_CATALOG
 
 
+def search(query, catalog):
+    """Searches the catalog and records the query time and the number of
+    results in the profile of the report being generated, if any
+    """
+    start = time.time()
+    brains = api.search(query, catalog)
+    profiler.record_query(time.time() - start, len(brains))
+    return brains
+
+
 def get_received_samples(from_date, to_date, **kwargs):
     """Returns the primary samples (no Partitions) that were received within
     the passed-in date range and parameters
@@ -46,7 +58,7 @@ def get_received_samples(from_date, to_date, **kwargs):
         "sort_order": "ascending",
     }
     query.update(**kwargs)
-    return api.search(query, SAMPLE_CATALOG)
+    return search(query, SAMPLE_CATALOG)
 
 
 def get_received_samples_by_year(year, **kwargs):
@@ -128,7 +140,7 @@ def get_analyses(from_date, to_date, **kwargs):
         "sort_order": "ascending",
     }
     query.update(**kwargs)
-    return api.search(query, ANALYSIS_CATALOG)
+    return search(query, ANALYSIS_CATALOG)
 
 
 def get_analyses_by_year(year, **kwargs):
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from bika.lims import api
+from senaite.core.catalog import SETUP_CATALOG
+
+# Portal types of setup objects whose titles are preloaded
+SETUP_TYPES = (
+    "AnalysisCategory",
+    "AnalysisProfile",
+    "Department",
+    "SampleType",
+)
+
+
+class TitleCache(object):
+    """Cache of object titles keyed by UID, meant to live for the duration of
+    a single report or export. The titles of setup objects are preloaded from
+    the setup catalog metadata with a single query on first use, so the setup
+    objects shared by thousands of rows are never woken up
+    """
+
+    def __init__(self, portal_types=SETUP_TYPES):
+        self.portal_types = portal_types
+        self.titles = None
+
+    def preload(self):
+        """Loads the titles of setup objects from catalog metadata
+        """
+        self.titles = {}
+        query = {"portal_type": list(self.portal_types)}
+        for brain in api.search(query, SETUP_CATALOG):
+            self.titles[brain.UID] = brain.Title or ""
+
+    def get(self, thing, default=""):
+        """Returns the title of the object or UID passed-in. Falls back to
+        the object for titles that were not preloaded
+        """
+        if self.titles is None:
+            self.preload()
+
+        if not thing:
+            return default
+
+        uid = thing if api.is_uid(thing) else api.get_uid(thing)
+        title = self.titles.get(uid)
+        if title is None:
+            obj = thing
+            if not api.is_object(obj):
+                obj = api.get_object_by_uid(uid, default=None)
+            title = api.get_title(obj) if obj else default
+            self.titles[uid] = title
+        return title
+
+    def get_titles(self, things, default=""):
+        """Returns the list of titles for the objects or UIDs passed-in
+        """
+        return [self.get(thing, default=default) for thing in things or []]
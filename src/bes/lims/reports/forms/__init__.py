@@ -21,7 +21,11 @@
 
 
 from datetime import datetime
+from itertools import chain
 
+from bes.lims.iterators import TemporaryFileIterator
+from bes.lims.iterators import get_temporary_file
+from bes.lims.reports import profiler
 from bika.lims import api
 from Products.Five import BrowserView
 from senaite.core.api import dtime
@@ -35,17 +39,22 @@ class CSVReport(BrowserView):
         return self.request.form["report_id"]
 
     def __call__(self):
-        # get the rows
-        rows = self.process_form()
+        # get the rows, either as a list or as a generator
+        rows = iter(self.process_form() or [])
 
-        # convert to csv
-        csv_data = self.to_csv(rows)
+        # fetch the first row before the response is prepared, so errors
+        # raised while searching are still reported back to the user
+        first = next(rows, None)
+        if first is not None:
+            rows = chain([first], rows)
 
         # download the csv
-        return self.download(csv_data)
+        return self.download(rows)
 
     def process_form(self):
-        """Returns a list of rows with same number of columns
+        """Returns an iterable of rows with same number of columns. Reports
+        with a large number of rows are encouraged to yield them instead of
+        building a list, so they are written to the output one by one
         """
         raise NotImplementedError("Not implemented")
 
@@ -54,9 +63,14 @@ class CSVReport(BrowserView):
         """
         output = StringIO()
         for row in rows:
-            output.write(",".join(map(self.quote, row)) + "\n")
+            output.write(self.to_csv_line(row))
         return output.getvalue()
 
+    def to_csv_line(self, row):
+        """Returns a CSV-like line with quoted values for the given row
+        """
+        return ",".join(map(self.quote, row)) + "\n"
+
     def quote(self, value):
         """Adds double quotes around the value
         """
@@ -66,18 +80,34 @@ class CSVReport(BrowserView):
         value = value.strip("\"").replace("\"", "'")
         return "\"{}\"".format(value)
 
-    def download(self, data):
-        """Adds the response headers for data download
+    def write_csv(self, rows, output):
+        """Writes the rows to the output stream as UTF-8 encoded CSV lines,
+        one by one, so the whole data is never kept in memory
+        """
+        num = size = 0
+        for row in rows:
+            line = self.to_csv_line(row)
+            line = api.safe_unicode(line).encode("utf-8")
+            output.write(line)
+            num += 1
+            size += len(line)
+        profiler.record_output(num, size)
+
+    def download(self, rows):
+        """Writes the rows to a temporary file and streams it to the response
+        in chunks, with the suitable headers for data download
         """
+        output = get_temporary_file()
+        self.write_csv(rows, output)
+        stream = TemporaryFileIterator(output)
+
         now = dtime.to_ansi(datetime.now())
         filename = "{}-{}.csv".format(self.report_id, now)
-        output = api.safe_unicode(data).encode("utf-8")
         set_header = self.request.response.setHeader
         set_header("Content-Disposition", "attachment; filename={}"
                    .format(filename))
         set_header("Content-Type", "text/csv")
-        set_header("Content-Length", len(output))
+        set_header("Content-Length", len(stream))
         set_header("Cache-Control", "no-store")
         set_header("Pragma", "no-cache")
-        self.request.response.write(output)
-        return output
+        return stream
@@ -26,16 +26,13 @@ from bes.lims import messageFactory as _
 from bes.lims.exceptions import TooManyRecordsError
 from bes.lims.reports import get_analyses
 from bes.lims.reports.forms import CSVReport
-from bes.lims.setuphandlers import deactivate
+from bes.lims.reports.loader import iter_samples
+from bes.lims.reports.rows import AnalysisRowBuilder
 from bes.lims.utils import is_reportable
+from bes.lims.utils import ReportableEvaluator
 from bika.lims import api
-from bika.lims.utils import format_supsub
-from bika.lims.utils import to_utf8
 from senaite.core.api import dtime
 from senaite.core.catalog import SAMPLE_CATALOG
-from senaite.core.i18n import translate
-from senaite.patient.api import get_age_ymd
-from senaite.patient.config import SEXES
 
 
 class AnalysesResults(CSVReport):
@@ -48,6 +45,9 @@ class AnalysesResults(CSVReport):
         # max analyses search
         self.max_records = 100000
 
+        # builder of the row values, shared with the analyses export
+        self.builder = AnalysisRowBuilder(separator="; ", html=False)
+
         # initialize the columns
         self.columns = OrderedDict((
             ("sample_id", {
@@ -107,103 +107,76 @@ class AnalysesResults(CSVReport):
 
         # do the search
         brains = get_analyses(date_from, date_to, **query)
+        if self.max_records and len(brains) > self.max_records:
+            raise TooManyRecordsError(
+                "Too many records (> %s). Please, refine your search" %
+                self.max_records
+            )
 
-        # Generate one row per analysis
-        rows = []
-        for brain in brains:
-            row = self.get_row(brain)
-            if not row:
-                continue
+        # Header row first
+        yield self.get_header_row()
 
-            rows.append(row)
-            if len(rows) > self.max_records:
-                raise TooManyRecordsError(
-                    "Too many records (> %s). Please, refine your search" %
-                    self.max_records
-                )
+        # Discard non-reportable analyses without loading them
+        brains = filter(ReportableEvaluator(), brains)
 
-        # Insert the header row at first position
-        rows.insert(0, self.get_header_row())
+        # Generate one row per analysis, with analyses grouped by sample
+        for sample, analyses in iter_samples(brains):
+            sample_info = None
+            for analysis in analyses:
+                # sample-specific info is shared by all its analyses
+                if sample_info is None:
+                    sample_info = self.get_sample_info(sample)
 
-        return list(filter(None, rows))
+                info = self.get_row_info(analysis, sample_info=sample_info)
+                yield [info.get(key, "") for key in self.columns.keys()]
 
     def get_header_row(self):
         """Returns a plain list with the column names
         """
         return [self.columns[key].get("title") for key in self.columns.keys()]
 
-    def get_row(self, analysis):
+    def get_row(self, analysis, sample_info=None):
         """Return a plain list with the column values for the given analysis
         """
         analysis = api.get_object(analysis)
         if not is_reportable(analysis):
-            analysis._p_deactivate()
             return None
 
-        info = self.get_row_info(analysis)
-        analysis._p_deactivate()
+        info = self.get_row_info(analysis, sample_info=sample_info)
         return [info.get(key, "") for key in self.columns.keys()]
 
-    def get_row_info(self, analysis):
-        sample = analysis.getRequest()
-        sampled = sample.getDateSampled()
-        dob = sample.getDateOfBirth()[0]
-        age = self.get_age(dob, sampled)
-        sampled = self.parse_date_to_output(sampled)
-        result_captured = self.parse_date_to_output(
-            analysis.getResultCaptureDate()
-        )
-        result_verified = self.parse_date_to_output(
-            analysis.getDateVerified()
-        )
-        # Only show results that appear on the final reports
-        result = ""
-        if analysis.getDatePublished():
-            result = analysis.getFormattedResult(html=False) or result
-            result = self.replace_html_breaklines(result)
-
-        # get the department title
-        department = analysis.getDepartment()
-        department = api.get_title(department) if department else ""
+    def get_sample_info(self, sample):
+        """Returns a dict with the row values that are common to all the
+        analyses from the given sample
+        """
+        info = self.builder.get_sample_info(sample)
+        info["collected"] = self.parse_date_to_output(info["collected"])
+        return info
 
-        profiles = self.get_analysis_profiles(sample)
-        unit = format_supsub(to_utf8(analysis.Unit))
+    def get_row_info(self, analysis, sample_info=None):
+        if sample_info is None:
+            sample_info = self.get_sample_info(analysis.getRequest())
 
-        # get the patient's gender/sex
-        gender = dict(SEXES).get(sample.getSex())
-        gender = translate(gender) if gender else ""
+        info = self.builder.get_analysis_info(analysis, sample_info)
 
-        # get the ward
-        ward = self.get_ward(sample)
-        ward = api.get_title(ward) if ward else ""
+        # Only show results that appear on the final reports
+        result = ""
+        if info["published"]:
+            result = info["result"]
 
         # add the info for each analysis in a row
-        return {
-            "sample_id": analysis.getRequestID(),
-            "sample_type": sample.getSampleTypeTitle() or "",
-            "age": age,
-            "gender": gender,
-            "collected": sampled,
-            "captured": result_captured,
-            "verified": result_verified,
-            "department": department,
-            "panels": ", ".join(profiles),
+        info.update({
+            "captured": self.parse_date_to_output(info["captured"]),
+            "verified": self.parse_date_to_output(info["verified"]),
             "test_type": self.get_analysis_fullname(analysis),
             "result": result,
-            "unit": unit,
-            "site": sample.getClientTitle() or "",
-            "ward": ward,
-        }
+        })
+        return info
 
     def get_age(self, dob, sampled):
         """Returns the age truncated to the highest period
         """
-        ymd = get_age_ymd(dob, sampled)
-        if not ymd:
-            return None
-        # truncate to highest period
-        matches = re.match(r"^(\d+[ymd])", ymd)
-        return matches.groups()[0]
+        return self.builder.get_age(dob, sampled) or None
 
     def replace_html_breaklines(self, text, replacement="; "):
         regex = r'<br\s*\/?>|<BR\s*\/?>'
@@ -227,11 +200,7 @@ class AnalysesResults(CSVReport):
         return date_from, date_to
 
     def get_ward(self, sample):
-        # TODO Remove after Wards are ported to bes.lims
-        accessor = getattr(sample, "getWard", None)
-        if callable(accessor):
-            return accessor()
-        return None
+        return self.builder.get_ward(sample)
 
     def get_first_sample_date(self):
         query = {
@@ -248,8 +217,8 @@ class AnalysesResults(CSVReport):
         return dtime.to_localized_time(date, long_format=True) or ""
 
     def get_analysis_profiles(self, sample):
-        profiles = sample.getProfiles()
-        return map(api.get_title, profiles)
+        profiles = sample.getRawProfiles()
+        return self.builder.titles.get_titles(profiles)
 
     def get_analysis_fullname(self, analysis):
         """Returns a string that in the format "<name> (keyword)"
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+import hashlib
+import json
+import shutil
+import time
+
+import transaction
+from bes.lims import logger
+from bes.lims.config import REPORT_JOBS_EXPIRY_DAYS
+from bes.lims.config import REPORT_JOBS_STORAGE
+from bes.lims.exceptions import StatisticsReportError
+from bes.lims.iterators import get_temporary_file
+from bes.lims.reports import profiler
+from bes.lims.reports.forms import CSVReport
+from bika.lims import api
+from bika.lims.decorators import synchronized
+from BTrees.OOBTree import OOBTree
+from persistent.list import PersistentList
+from persistent.mapping import PersistentMapping
+from ZODB.blob import Blob
+from ZODB.POSException import ConflictError
+from zope.annotation.interfaces import IAnnotations
+from zope.component import queryMultiAdapter
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Statuses of the jobs whose results can be shared with new requests
+REUSABLE_STATUSES = (QUEUED, RUNNING, DONE)
+
+# Form keys that do not have any effect on the results of the report
+SKIP_FORM_KEYS = ("submit", "background", "report_id", "_authenticator")
+
+# Number of rows processed between two progress updates
+PROGRESS_STEP = 1000
+
+# Max number of attempts to store the final status of a job on conflicts
+MAX_COMMIT_ATTEMPTS = 5
+
+# Seconds a running job can go without progress before it is considered
+# dead (e.g. the worker was killed) and marked as failed
+RUNNING_TIMEOUT = 3600
+
+
+def _get_jobs():
+    """Returns an OOBTree of report jobs, keyed by job_id
+    """
+    portal = api.get_portal()
+    annotation = IAnnotations(portal)
+    if annotation.get(REPORT_JOBS_STORAGE) is None:
+        annotation[REPORT_JOBS_STORAGE] = OOBTree()
+    return annotation[REPORT_JOBS_STORAGE]
+
+
+def get_params(form):
+    """Returns a dict with the parameters from the form that have an effect
+    on the results of the report
+    """
+    params = {}
+    for key, value in form.items():
+        if key in SKIP_FORM_KEYS:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = sorted(value)
+        params[key] = value
+    return params
+
+
+def is_report(report_id):
+    """Returns whether the id passed-in is the name of a statistic report
+    """
+    if not api.is_string(report_id):
+        return False
+    portal = api.get_portal()
+    request = api.get_request()
+    view = queryMultiAdapter((portal, request), name=report_id)
+    return isinstance(view, CSVReport)
+
+
+def get_job_id(report_id, params):
+    """Returns the job id for the given report and parameters. Jobs for the
+    same report and parameters share the same id
+    """
+    raw = json.dumps([report_id, params], sort_keys=True)
+    return hashlib.sha1(raw).hexdigest()
+
+
+def is_expired(job, now=None):
+    """Returns whether the job passed-in has expired
+    """
+    expires = job.get("expires")
+    if not expires:
+        return False
+    now = now or int(time.time())
+    return expires <= now
+
+
+def get(job_id, default=None):
+    """Returns the job for the given id
+    """
+    return _get_jobs().get(job_id, default)
+
+
+@synchronized(max_connections=1)
+def put(report_id, form, user_id):
+    """Adds a job for the given report and form parameters, or returns the
+    existing one if a job with the same report and parameters is either
+    queued, running or done, and has not expired yet
+    :param report_id: The id (view name) of the report to generate
+    :param form: The form with the parameters of the report
+    :param user_id: The id of the user who requested the report
+    :returns: the job
+    """
+    if not is_report(report_id):
+        raise StatisticsReportError("Not a statistic report: %s"
+                                    % repr(report_id))
+
+    params = get_params(form)
+    job_id = get_job_id(report_id, params)
+    jobs = _get_jobs()
+
+    job = jobs.get(job_id)
+    if job and job["status"] in REUSABLE_STATUSES and not is_expired(job):
+        if user_id not in job["users"]:
+            job["users"].append(user_id)
+        logger.info("Report job %s [reused]" % job_id)
+        return job
+
+    job = PersistentMapping({
+        "job_id": job_id,
+        "report_id": report_id,
+        "params": params,
+        "users": PersistentList([user_id]),
+        "status": QUEUED,
+        "created": int(time.time()),
+        "started": None,
+        "finished": None,
+        "expires": None,
+        "progress": 0,
+        "error": "",
+        "size": 0,
+        "blob": None,
+    })
+    jobs[job_id] = job
+    logger.info("Report job %s [queued]" % job_id)
+    return job
+
+
+@synchronized(max_connections=1)
+def cancel(job_id, user_id):
+    """Removes the user from the job. The job is cancelled when no other
+    users are waiting for it
+    :returns: True if the job was found
+    :rtype: bool
+    """
+    job = get(job_id)
+    if not job:
+        return False
+
+    if user_id in job["users"]:
+        job["users"].remove(user_id)
+
+    if not job["users"] and job["status"] in (QUEUED, RUNNING):
+        job["status"] = CANCELLED
+        job["finished"] = int(time.time())
+        job["expires"] = job["finished"]
+        logger.info("Report job %s [cancelled]" % job_id)
+    return True
+
+
+def get_jobs_for(user_id):
+    """Returns the non-expired jobs requested by the given user, most recent
+    first
+    """
+    now = int(time.time())
+    jobs = filter(lambda job: user_id in job["users"], _get_jobs().values())
+    jobs = filter(lambda job: not is_expired(job, now=now), jobs)
+    return sorted(jobs, key=lambda job: job["created"], reverse=True)
+
+
+def get_next():
+    """Returns the oldest queued job, if any
+    """
+    queued = filter(lambda job: job["status"] == QUEUED, _get_jobs().values())
+    if not queued:
+        return None
+    return sorted(queued, key=lambda job: job["created"])[0]
+
+
+def purge():
+    """Removes the expired jobs, along with their results. Running jobs that
+    did not report progress for a while are marked as failed instead
+    :returns: the number of jobs removed
+    """
+    now = int(time.time())
+    jobs = _get_jobs()
+    expired = [job_id for job_id, job in jobs.items()
+               if is_expired(job, now=now)]
+    purged = 0
+    for job_id in expired:
+        job = jobs[job_id]
+        if job["status"] == RUNNING:
+            job["status"] = FAILED
+            job["error"] = "Timed out"
+            job["finished"] = now
+            job["expires"] = now + REPORT_JOBS_EXPIRY_DAYS * 86400
+            logger.warn("Report job %s [timed out]" % job_id)
+            continue
+        del jobs[job_id]
+        purged += 1
+        logger.info("Report job %s [purged]" % job_id)
+    return purged
+
+
+def _update_progress(job, progress):
+    """Stores the progress of the job and commits, so it becomes visible to
+    other clients. Returns whether the job has to keep running
+    """
+    job["progress"] = progress
+    job["expires"] = int(time.time()) + RUNNING_TIMEOUT
+    try:
+        transaction.commit()
+    except ConflictError:
+        # the job was modified (e.g. cancelled) meanwhile
+        transaction.abort()
+    return job["status"] == RUNNING
+
+
+def process(job):
+    """Generates the report for the job passed-in, off-request. The rows are
+    written to a temporary file and the result is stored as a blob
+    :returns: True if the job was completed
+    :rtype: bool
+    """
+    job_id = job["job_id"]
+    job["status"] = RUNNING
+    job["started"] = int(time.time())
+    # considered dead if no progress is reported before it expires
+    job["expires"] = job["started"] + RUNNING_TIMEOUT
+    try:
+        transaction.commit()
+    except ConflictError:
+        # picked up by another run (or cancelled) meanwhile
+        transaction.abort()
+        logger.info("Report job %s [skipped]" % job_id)
+        return False
+
+    # feed the request with the parameters of the report
+    request = api.get_request()
+    request.form.clear()
+    request.form.update(job["params"])
+    request.form["report_id"] = job["report_id"]
+
+    output = get_temporary_file()
+    try:
+        try:
+            portal = api.get_portal()
+            report = api.get_view(job["report_id"], context=portal,
+                                  request=request)
+            # no limit on the number of records off-request
+            if getattr(report, "max_records", None):
+                report.max_records = None
+            with profiler.profiled(job["report_id"], job["params"]):
+                progress = 0
+                for row in report.process_form() or []:
+                    report.write_csv([row], output)
+                    progress += 1
+                    if progress % PROGRESS_STEP:
+                        continue
+                    if not _update_progress(job, progress):
+                        logger.info("Report job %s [stopped]" % job_id)
+                        return False
+
+            values = {
+                "size": output.tell(),
+                "progress": progress,
+                "status": DONE,
+            }
+
+        except Exception as e:
+            transaction.abort()
+            values = {
+                "status": FAILED,
+                "error": str(e),
+            }
+            logger.error("Report job %s [failed]: %s" % (job_id, str(e)))
+
+        return _finish(job_id, values, output)
+
+    finally:
+        output.close()
+
+
+def _finish(job_id, values, output):
+    """Stores the final values of the job, along with the results from the
+    output file if done, and commits. If the job was modified meanwhile, the
+    values are re-applied to the latest version of the job, unless it was
+    cancelled or removed
+    :returns: True if the job was completed
+    :rtype: bool
+    """
+    for attempt in range(MAX_COMMIT_ATTEMPTS):
+        job = get(job_id)
+        if not job or job["status"] != RUNNING:
+            # cancelled or purged meanwhile
+            transaction.abort()
+            logger.info("Report job %s [stopped]" % job_id)
+            return False
+
+        job.update(values)
+        if job["status"] == DONE:
+            # store the result as a blob
+            output.seek(0)
+            blob = Blob()
+            with blob.open("w") as blob_file:
+                shutil.copyfileobj(output, blob_file)
+            job["blob"] = blob
+
+        job["finished"] = int(time.time())
+        job["expires"] = job["finished"] + REPORT_JOBS_EXPIRY_DAYS * 86400
+        try:
+            transaction.commit()
+            return job["status"] == DONE
+        except ConflictError:
+            # the job was modified (e.g. cancelled) meanwhile
+            transaction.abort()
+            logger.warn("Report job %s [conflict, attempt %s]"
+                        % (job_id, attempt + 1))
+
+    logger.error("Report job %s [cannot be stored]" % job_id)
+    return False
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+import os
+from datetime import datetime
+
+from bes.lims.reports import jobs
+from bika.lims import api
+from plone.protect import CheckAuthenticator
+from Products.Five.browser import BrowserView
+from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+from ZPublisher.Iterators import filestream_iterator
+
+
+class ReportJobsView(BrowserView):
+    """Lists the reports requested by the current user for generation in
+    background, and allows their download or cancellation
+    """
+    template = ViewPageTemplateFile("templates/report_jobs.pt")
+
+    def __call__(self):
+        form = self.request.form
+        job_id = form.get("job_id")
+
+        if job_id and form.get("download"):
+            return self.download(job_id)
+
+        if job_id and self.request.method == "POST":
+            CheckAuthenticator(self.request)
+            if form.get("action") == "cancel":
+                jobs.cancel(job_id, self.get_user_id())
+            return self.request.response.redirect(self.request.URL)
+
+        return self.template()
+
+    def get_user_id(self):
+        """Returns the id of the current user
+        """
+        return api.get_current_user().getId()
+
+    def get_jobs(self):
+        """Returns display-ready dicts for the jobs of the current user
+        """
+        records = []
+        for job in jobs.get_jobs_for(self.get_user_id()):
+            params = ["%s: %s" % (key, value) for key, value in
+                      sorted(job["params"].items())]
+            records.append({
+                "job_id": job["job_id"],
+                "report_id": job["report_id"],
+                "params": ", ".join(params),
+                "status": job["status"],
+                "progress": job["progress"],
+                "created": self._format_ts(job["created"]),
+                "expires": self._format_ts(job["expires"]),
+                "error": job["error"],
+                "downloadable": job["status"] == jobs.DONE,
+                "cancellable": job["status"] in (jobs.QUEUED, jobs.RUNNING),
+            })
+        return records
+
+    def download(self, job_id):
+        """Streams the results of the job to the response
+        """
+        job = jobs.get(job_id)
+        if not job or self.get_user_id() not in job["users"]:
+            self.request.response.setStatus(404)
+            return
+
+        if job["status"] != jobs.DONE or jobs.is_expired(job):
+            self.request.response.setStatus(404)
+            return
+
+        path = job["blob"].committed()
+        created = datetime.fromtimestamp(job["created"])
+        filename = "{}-{}.csv".format(job["report_id"],
+                                      created.strftime("%Y%m%d%H%M%S"))
+        set_header = self.request.response.setHeader
+        set_header("Content-Disposition", "attachment; filename={}"
+                   .format(filename))
+        set_header("Content-Type", "text/csv")
+        set_header("Content-Length", os.path.getsize(path))
+        set_header("Cache-Control", "no-store")
+        set_header("Pragma", "no-cache")
+        return filestream_iterator(path, "rb")
+
+    def _format_ts(self, timestamp):
+        if not timestamp:
+            return ""
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from collections import OrderedDict
+
+from bika.lims import api
+
+# Number of samples whose objects are loaded from the storage at once
+BATCH_SIZE = 50
+
+
+def group_by_sample(brains):
+    """Returns an ordered dict with the analysis brains passed-in grouped by
+    the path of the sample they belong to, sorted by first appearance
+    """
+    groups = OrderedDict()
+    for brain in brains:
+        path, _ = split_path(brain)
+        groups.setdefault(path, []).append(brain)
+    return groups
+
+
+def prefetch(objects):
+    """Loads the state of the persistent objects passed-in from the storage
+    in a single round trip, if supported by the database connection
+    """
+    objects = filter(lambda obj: getattr(obj, "_p_jar", None), objects)
+    if not objects:
+        return
+    connection = objects[0]._p_jar
+    func = getattr(connection, "prefetch", None)
+    if callable(func):
+        func(objects)
+
+
+def split_path(brain):
+    """Returns a tuple of (parent path, id) from the path of the brain
+    """
+    return brain.getPath().rsplit("/", 1)
+
+
+def get_sample(portal, brains):
+    """Returns the sample the analysis brains passed-in belong to, without
+    loading its state from the storage, or None if not found
+    """
+    path, _ = split_path(brains[0])
+    try:
+        return portal.unrestrictedTraverse(path)
+    except (KeyError, AttributeError):
+        return None
+
+
+def iter_samples(brains, batch_size=BATCH_SIZE, deactivate=True):
+    """Yields tuples of (sample, analyses) for the analysis brains passed-in,
+    grouped by sample. Samples and analyses are loaded from the storage in
+    batches of samples, in a single round trip per batch. If deactivate is
+    True, the objects are flushed from memory once consumed
+    """
+    portal = api.get_portal()
+    groups = group_by_sample(brains).values()
+    for start in range(0, len(groups), batch_size):
+        batch = groups[start:start+batch_size]
+
+        # load the samples of the batch at once
+        samples = [get_sample(portal, items) for items in batch]
+        prefetch(filter(None, samples))
+
+        # load the analyses of the batch at once
+        records = []
+        for sample, items in zip(samples, batch):
+            if sample is None:
+                continue
+            ids = [split_path(brain)[1] for brain in items]
+            analyses = [sample._getOb(an_id, None) for an_id in ids]
+            records.append((sample, filter(None, analyses)))
+        prefetch([an for sample, analyses in records for an in analyses])
+
+        for sample, analyses in records:
+            yield sample, analyses
+
+            if deactivate:
+                # flush the sample and analyses from memory
+                for analysis in analyses:
+                    analysis._p_deactivate()
+                sample._p_deactivate()
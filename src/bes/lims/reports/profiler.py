@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from bes.lims import logger
+from bika.lims import api
+from zope.annotation.interfaces import IAnnotations
+
+# Request annotation key where the profile of the running report is kept
+PROFILE_KEY = "bes.lims.reports.profile"
+
+# Reports that take longer than this number of seconds are logged as slow
+SLOW_REPORT_SECONDS = 30
+
+# Number of recent profiles kept in memory by this process
+MAX_PROFILES = 200
+
+_profiles = deque(maxlen=MAX_PROFILES)
+_lock = threading.Lock()
+
+
+def get_load_count():
+    """Returns the number of objects loaded from the storage by the current
+    database connection so far
+    """
+    connection = getattr(api.get_portal(), "_p_jar", None)
+    counts = getattr(connection, "getTransferCounts", None)
+    if not callable(counts):
+        return 0
+    return counts()[0]
+
+
+class ReportProfile(object):
+    """Metrics collected while a report is generated
+    """
+
+    def __init__(self, report_id, params):
+        self.report_id = report_id
+        self.params = params
+        self.started = time.time()
+        self.loads_start = get_load_count()
+        self.queries = 0
+        self.query_time = 0.0
+        self.brains = 0
+        self.rows = 0
+        self.bytes = 0
+        self.loads = 0
+        self.duration = 0.0
+        self.error = ""
+
+    def add_query(self, duration, count):
+        """Records a catalog query that took the duration (in seconds) and
+        returned the count of brains passed-in
+        """
+        self.queries += 1
+        self.query_time += duration
+        self.brains += count
+
+    def add_output(self, rows, size):
+        """Records rows and bytes written to the output
+        """
+        self.rows += rows
+        self.bytes += size
+
+    def finish(self):
+        """Closes the profile and computes the totals
+        """
+        self.duration = time.time() - self.started
+        self.loads = get_load_count() - self.loads_start
+
+    def is_slow(self):
+        return self.duration >= SLOW_REPORT_SECONDS
+
+    def to_dict(self):
+        return {
+            "report_id": self.report_id,
+            "params": self.params,
+            "started": int(self.started),
+            "duration": round(self.duration, 3),
+            "queries": self.queries,
+            "query_time": round(self.query_time, 3),
+            "brains": self.brains,
+            "loads": self.loads,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "error": self.error,
+        }
+
+
+def get_current():
+    """Returns the profile of the report being generated in the current
+    request, if any
+    """
+    annotations = IAnnotations(api.get_request(), None)
+    if annotations is None:
+        return None
+    return annotations.get(PROFILE_KEY)
+
+
+def record_query(duration, count):
+    """Records a catalog query in the profile of the current report, if any
+    """
+    profile = get_current()
+    if profile:
+        profile.add_query(duration, count)
+
+
+def record_output(rows, size):
+    """Records the output in the profile of the current report, if any
+    """
+    profile = get_current()
+    if profile:
+        profile.add_output(rows, size)
+
+
+@contextmanager
+def profiled(report_id, params):
+    """Context manager that collects the metrics of the report generated
+    inside, writes them to the log and keeps them in memory
+    """
+    annotations = IAnnotations(api.get_request(), None)
+    profile = ReportProfile(report_id, params)
+    if annotations is not None:
+        annotations[PROFILE_KEY] = profile
+    try:
+        yield profile
+    except Exception as e:
+        profile.error = repr(e)
+        raise
+    finally:
+        profile.finish()
+        if annotations is not None:
+            annotations.pop(PROFILE_KEY, None)
+        store(profile)
+
+
+def store(profile):
+    """Writes the profile to the log and keeps it in memory
+    """
+    record = profile.to_dict()
+    log = logger.warning if profile.is_slow() else logger.info
+    log("Report profile: %s" % json.dumps(record, sort_keys=True))
+    with _lock:
+        _profiles.append(record)
+
+
+def get_slowest(limit=20):
+    """Returns the slowest of the recent report profiles kept in memory by
+    this process, slowest first
+    """
+    with _lock:
+        records = list(_profiles)
+    records = sorted(records, key=lambda rec: rec["duration"], reverse=True)
+    return records[:limit]
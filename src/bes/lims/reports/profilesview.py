@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from datetime import datetime
+
+from bes.lims.reports import profiler
+from Products.Five.browser import BrowserView
+from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+
+
+class ReportProfilesView(BrowserView):
+    """Lists the slowest statistic reports generated recently by this Zope
+    process, along with the metrics collected while they were generated
+    """
+    template = ViewPageTemplateFile("templates/report_profiles.pt")
+
+    def __call__(self):
+        return self.template()
+
+    def get_profiles(self):
+        """Returns display-ready dicts for the slowest recent reports
+        """
+        records = []
+        for rec in profiler.get_slowest():
+            params = ["%s: %s" % (key, value) for key, value in
+                      sorted(rec["params"].items())]
+            record = dict(rec)
+            record.update({
+                "params": ", ".join(params),
+                "started": self._format_ts(rec["started"]),
+                "slow": rec["duration"] >= profiler.SLOW_REPORT_SECONDS,
+            })
+            records.append(record)
+        return records
+
+    def _format_ts(self, timestamp):
+        if not timestamp:
+            return ""
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
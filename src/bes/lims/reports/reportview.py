@@ -21,9 +21,12 @@
 
 from datetime import datetime
 
+from bes.lims import messageFactory as _
 from bes.lims.config import TARGET_PATIENTS
 from bes.lims.exceptions import StatisticsReportError
 from bes.lims.exceptions import TooManyRecordsError
+from bes.lims.reports import jobs
+from bes.lims.reports import profiler
 from bika.lims import api
 from plone.memoize import view
 from Products.Five.browser import BrowserView
@@ -39,6 +42,7 @@ DATE_CONTROL = "controls/date.pt"
 TARGET_PATIENT_CONTROL = "controls/target_patient.pt"
 DEPARTMENT_CONTROL = "controls/department.pt"
 ANALYSIS_STATES_CONTROL = "controls/analysis_states.pt"
+BACKGROUND_CONTROL = "controls/background.pt"
 
 
 class StatisticReportsView(BrowserView):
@@ -52,16 +56,38 @@ class StatisticReportsView(BrowserView):
         submit = form.get("submit")
         report_id = form.get("report_id")
 
+        if submit and report_id and form.get("background"):
+            return self.enqueue(report_id)
+
         if submit and report_id:
             report_form = api.get_view(report_id)
+            params = jobs.get_params(form)
             try:
-                return report_form()
+                with profiler.profiled(report_id, params):
+                    return report_form()
             except (TooManyRecordsError, StatisticsReportError) as e:
                 err_msg = str(e)
                 self.context.plone_utils.addPortalMessage(err_msg, "error")
 
         return self.template()
 
+    def enqueue(self, report_id):
+        """Adds a job for the generation of the report in background and
+        redirects the user to the listing of requested reports
+        """
+        user_id = api.get_current_user().getId()
+        try:
+            jobs.put(report_id, self.request.form, user_id)
+        except StatisticsReportError as e:
+            self.context.plone_utils.addPortalMessage(str(e), "error")
+            return self.template()
+        message = _("The report will be generated in background. You can "
+                    "download it from this page once done")
+        self.context.plone_utils.addPortalMessage(message, "info")
+        portal_url = api.get_url(api.get_portal())
+        url = "{}/report_jobs".format(portal_url)
+        return self.request.response.redirect(url)
+
     def year_control(self):
         """Returns the control for year selection
         """
@@ -87,6 +113,11 @@ class StatisticReportsView(BrowserView):
         """
         return PT(ANALYSIS_STATES_CONTROL)(self)
 
+    def background_control(self):
+        """Returns the control for the generation of the report in background
+        """
+        return PT(BACKGROUND_CONTROL)(self)
+
     @view.memoize
     def get_years(self):
         """Returns the list of years since the first sample was created
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+import re
+
+from bes.lims.reports.cache import TitleCache
+from bika.lims import api
+from bika.lims.utils import format_supsub
+from bika.lims.utils import to_utf8
+from bika.lims.utils.analysis import format_interim
+from senaite.core.api import dtime
+from senaite.core.i18n import translate
+from senaite.patient.api import get_age_ymd
+from senaite.patient.config import SEXES
+
+# Matches html break lines
+BREAKLINES = re.compile(r"<br\s*\/?>", re.IGNORECASE)
+
+
+class AnalysisRowBuilder(object):
+    """Builds the values for the rows of reports and exports of analyses, one
+    row per analysis. Values are kept typed (dates as DateTime, ages as
+    numbers), so the same values can be either formatted as text or written
+    to typed outputs. The values common to all analyses of a sample are
+    computed once per sample
+    """
+
+    def __init__(self, titles=None, separator=", ", html=True):
+        # titles of setup objects, shared by all rows
+        self.titles = titles or TitleCache()
+        # separator for analyses with multiple results
+        self.separator = separator
+        # whether results are formatted as html before the break lines are
+        # replaced by the separator, or as plain text
+        self.html = html
+
+    def get_sample_info(self, sample):
+        """Returns a dict with the values that are common to all the analyses
+        from the given sample
+        """
+        sampled = sample.getDateSampled()
+        dob = sample.getDateOfBirth()[0]
+
+        # get the patient's gender/sex
+        gender = dict(SEXES).get(sample.getSex())
+        gender = translate(gender) if gender else ""
+
+        return {
+            "sample_id": api.get_id(sample),
+            "tamanu_id": sample.getTamanuID() or "",
+            "sample_type": self.titles.get(sample.getRawSampleType()),
+            "age": self.get_age(dob, sampled),
+            "age_years": self.get_age_years(dob, sampled),
+            "gender": gender,
+            "collected": sampled,
+            "created": sample.created(),
+            "panels": ", ".join(self.titles.get_titles(
+                sample.getRawProfiles())),
+            "site": sample.getClientTitle() or "",
+            "ward": self.titles.get(self.get_ward(sample)),
+        }
+
+    def get_analysis_info(self, analysis, sample_info=None):
+        """Returns a dict with the values of the row for the given analysis,
+        including those from its sample
+        """
+        if sample_info is None:
+            sample_info = self.get_sample_info(analysis.getRequest())
+
+        unit = analysis.Unit
+        unit = format_supsub(to_utf8(unit)) if unit else ""
+
+        info = dict(sample_info)
+        info.update({
+            "sample_id": analysis.getRequestID(),
+            "test_id": analysis.getId() or "",
+            "test_type": analysis.Title(),
+            "keyword": analysis.getKeyword(),
+            "captured": analysis.getResultCaptureDate(),
+            "verified": analysis.getDateVerified(),
+            "published": analysis.getDatePublished(),
+            "department": self.titles.get(analysis.getRawDepartment()),
+            "category": self.titles.get(analysis.getCategoryUID()),
+            "result": self.get_result(analysis),
+            "unit": unit,
+            "status": api.get_review_status(analysis),
+            "result_variables": self.get_result_variables(analysis),
+        })
+        return info
+
+    def get_result(self, analysis):
+        """Returns the formatted result of the analysis, with the break lines
+        replaced by the separator
+        """
+        result = analysis.getFormattedResult(html=self.html) or ""
+        return BREAKLINES.sub(self.separator, result)
+
+    def get_result_variables(self, analysis):
+        """Returns the result variables of the analysis that are displayed in
+        results reports, one per line
+        """
+        results = []
+        for interim in analysis.getInterimFields() or []:
+            # skip if not shown in report
+            if not interim.get("report", False):
+                continue
+
+            formatted = format_interim(interim, html=False)
+
+            title = formatted.get("title", "").strip()
+            value = formatted.get("formatted_value", "").strip()
+            unit = formatted.get("formatted_unit", "").strip()
+
+            # combine value and unit
+            detail = (value + " " + unit) if value and unit else value
+
+            results.append("{}: {}".format(title, detail))
+
+        return "\n".join(results)
+
+    def get_age(self, dob, sampled):
+        """Returns the age truncated to the highest period (e.g. 5y)
+        """
+        ymd = get_age_ymd(dob, sampled)
+        if not ymd:
+            return ""
+        # truncate to highest period
+        matches = re.match(r"^(\d+[ymd])", ymd)
+        return matches.groups()[0] if matches else ""
+
+    def get_age_years(self, dob, sampled):
+        """Returns the age in years, with decimals, or None
+        """
+        if not all([dtime.is_date(dob), dtime.is_date(sampled)]):
+            return None
+        days = dtime.to_DT(sampled) - dtime.to_DT(dob)
+        if days < 0:
+            return None
+        return round(days / 365.25, 2)
+
+    def get_ward(self, sample):
+        # TODO Remove after Wards are ported to bes.lims
+        for name in ("getRawWard", "getWard"):
+            accessor = getattr(sample, name, None)
+            if callable(accessor):
+                return accessor()
+        return None
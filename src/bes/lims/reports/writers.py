@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+import csv
+import gzip
+import shutil
+
+from bika.lims import api
+from senaite.core.api import dtime
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # Parquet output is only available when pyarrow is installed
+    pyarrow = None
+
+# Types of the columns of typed outputs
+TEXT = "text"
+DATETIME = "datetime"
+NUMBER = "number"
+CATEGORY = "category"
+
+# Number of rows kept in memory before being written as a row group
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+def to_typed_value(value, column_type):
+    """Converts the value to the python type suitable for the column type.
+    Returns None for empty values
+    """
+    if value is None or value == "":
+        return None
+    if column_type == DATETIME:
+        if not dtime.is_date(value):
+            return None
+        # naive datetime in UTC
+        return dtime.to_DT(value).toZone("UTC").asdatetime().replace(
+            tzinfo=None)
+    if column_type == NUMBER:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return api.safe_unicode(value)
+
+
+class TypedCSVWriter(object):
+    """Writes rows of typed values to a gzip-compressed CSV file. Dates are
+    written in ISO format and numbers unquoted, so they are recognized with
+    their type by analytics tools (pandas, DuckDB, etc.). Files written
+    without header can be merged by concatenation
+    """
+    extension = "csv.gz"
+
+    def __init__(self, path, columns, header=True):
+        self.path = path
+        self.columns = columns
+        self.output = gzip.open(path, "wb")
+        self.writer = csv.writer(self.output, quoting=csv.QUOTE_MINIMAL,
+                                 lineterminator="\n")
+        if header:
+            self.writer.writerow([name for name, column_type in columns])
+
+    def to_text(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return repr(value)
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return api.safe_unicode(value).encode("utf-8")
+
+    def write(self, row):
+        values = [to_typed_value(value, column_type) for value, (name,
+                  column_type) in zip(row, self.columns)]
+        self.writer.writerow(map(self.to_text, values))
+
+    def close(self):
+        self.output.close()
+
+    @classmethod
+    def merge(cls, parts, path, columns):
+        """Merges the part files written without header into a single file
+        """
+        header = cls(path, columns)
+        header.close()
+        with open(path, "ab") as output:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, output)
+
+
+class ParquetWriter(object):
+    """Writes rows of typed values to a Parquet file, with dates stored as
+    timestamps, numbers as doubles and categories dictionary-encoded
+    """
+    extension = "parquet"
+
+    def __init__(self, path, columns, header=True):
+        self.path = path
+        self.columns = columns
+        self.schema = self.get_schema(columns)
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.rows = []
+
+    @classmethod
+    def get_schema(cls, columns):
+        types = {
+            TEXT: pyarrow.string(),
+            DATETIME: pyarrow.timestamp("s"),
+            NUMBER: pyarrow.float64(),
+            CATEGORY: pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+        }
+        fields = [pyarrow.field(name, types[column_type])
+                  for name, column_type in columns]
+        return pyarrow.schema(fields)
+
+    def write(self, row):
+        values = [to_typed_value(value, column_type) for value, (name,
+                  column_type) in zip(row, self.columns)]
+        self.rows.append(values)
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Writes the rows kept in memory as a row group
+        """
+        if not self.rows:
+            return
+        arrays = []
+        for pos, (name, column_type) in enumerate(self.columns):
+            values = [row[pos] for row in self.rows]
+            if column_type == CATEGORY:
+                array = pyarrow.array(values, type=pyarrow.string())
+                array = array.dictionary_encode()
+            else:
+                array = pyarrow.array(values, type=self.schema[pos].type)
+            arrays.append(array)
+        table = pyarrow.Table.from_arrays(arrays, schema=self.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    @classmethod
+    def merge(cls, parts, path, columns):
+        """Merges the part files into a single file, one row group at a time
+        """
+        writer = pyarrow.parquet.ParquetWriter(path, cls.get_schema(columns))
+        for part in parts:
+            part_file = pyarrow.parquet.ParquetFile(part)
+            for num in range(part_file.num_row_groups):
+                writer.write_table(part_file.read_row_group(num))
+        writer.close()
+
+
+def get_typed_writer_class():
+    """Returns the class of the writer for typed outputs: Parquet if pyarrow
+    is installed, gzip-compressed CSV otherwise
+    """
+    if pyarrow is not None:
+        return ParquetWriter
+    return TypedCSVWriter
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import json
+import threading
+
+from senaite.ast.config import IDENTIFICATION_KEY
+from senaite.ast.config import RESISTANCE_KEY
+
+# Compiled formatters, keyed by the identity and version (modification time)
+# of the analysis. Kept bounded, the cache is cleared when full
+FORMATTERS = {}
+FORMATTERS_LOCK = threading.Lock()
+MAX_FORMATTERS = 500
+
+# Max number of raw results memoized by each formatter
+MAX_RESULTS = 1000
+
+# Keywords of the analyses whose results are formatted with a formatter
+KEYWORDS = (RESISTANCE_KEY, IDENTIFICATION_KEY)
+
+
+def prefix_category(text):
+    """Returns the text of a resistance result option with the sensitivity
+    category (R/S/I) as prefix. E.g. "Amikacin: S" -> "S: Amikacin"
+    """
+    if ": " not in text:
+        return text
+    idx = text.rindex(": ")
+    category = text[idx+2:]
+    if not category:
+        category = "?"
+    return "{}: {}".format(category, text[:idx])
+
+
+def to_list(value):
+    """Returns the list the JSON value passed-in represents, or None
+    """
+    try:
+        value = json.loads(value)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(value, list):
+        return None
+    return value
+
+
+class ResultOptionsFormatter(object):
+    """Maps the raw results of an analysis with result options to their
+    display texts. The raw results are resolved only once
+    """
+
+    def __init__(self, options, prefix=False):
+        values = map(lambda o: str(o["ResultValue"]), options)
+        texts = map(lambda o: str(o["ResultText"]), options)
+        if prefix:
+            texts = map(prefix_category, texts)
+        self.values_texts = dict(zip(values, texts))
+        self._texts = {}
+
+    def get_text(self, result):
+        """Returns the display text of the result if it matches with a single
+        result option. Returns None otherwise
+        """
+        return self.values_texts.get(str(result))
+
+    def get_texts(self, result):
+        """Returns the list of display texts of a result with multiple options
+        e.g. "['2', '1']". Texts of values without a matching result option
+        are None. Returns None if the result is not a list of options
+        """
+        key = str(result)
+        if key in self._texts:
+            return self._texts[key]
+
+        values = to_list(result)
+        texts = None
+        if values is not None:
+            texts = map(lambda v: self.values_texts.get(str(v)), values)
+
+        if len(self._texts) >= MAX_RESULTS:
+            self._texts.clear()
+        self._texts[key] = texts
+        return texts
+
+
+def get_cache_key(analysis):
+    """Returns a tuple (identity, version) for the analysis passed-in, or None
+    if the analysis has changes that are not committed yet
+    """
+    oid = getattr(analysis, "_p_oid", None)
+    if not oid:
+        return None
+    # ensure the modification time is loaded for ghosts
+    analysis._p_activate()
+    if analysis._p_changed:
+        return None
+    return oid, analysis._p_mtime
+
+
+def get_formatter(analysis):
+    """Returns the formatter for the result options of the analysis passed-in
+    """
+    key = get_cache_key(analysis)
+    formatter = FORMATTERS.get(key) if key else None
+    if formatter is None:
+        keyword = analysis.getKeyword()
+        options = analysis.getResultOptions() or []
+        formatter = ResultOptionsFormatter(
+            options, prefix=keyword == RESISTANCE_KEY)
+        if key:
+            with FORMATTERS_LOCK:
+                if len(FORMATTERS) >= MAX_FORMATTERS:
+                    FORMATTERS.clear()
+                FORMATTERS[key] = formatter
+    return formatter
+
+
+def get_growth_numbers(analysis):
+    """Returns the list of growth numbers of the identification analysis
+    passed-in, one per microorganism
+    """
+    for interim in analysis.getInterimFields():
+        if interim.get("keyword") == "growth":
+            return to_list(interim.get("value")) or [""]
+    return [""]
+
+
+def format_result(analysis, separator="<br/>"):
+    """Returns the result of the resistance or identification analysis
+    passed-in with the display texts of the result options, joined by the
+    separator when the result has multiple options. The sensitivity category
+    is prefixed to resistance results and the growth number to identified
+    microorganisms. Returns None if the result cannot be formatted this way
+    """
+    keyword = analysis.getKeyword()
+    if keyword not in KEYWORDS:
+        return None
+
+    result = analysis.getResult()
+    formatter = get_formatter(analysis)
+    match = formatter.get_text(result)
+
+    if keyword == RESISTANCE_KEY:
+        if match:
+            return match
+        texts = formatter.get_texts(result)
+        if texts is None:
+            return None
+        return separator.join(filter(None, texts))
+
+    # display the growth number next to each microorganism
+    growth = get_growth_numbers(analysis)
+    if match:
+        return "#{} {}".format(growth[0], match)
+
+    texts = formatter.get_texts(result)
+    if texts is None or None in texts:
+        return None
+
+    # prepend '#' to growth numbers
+    def prepend_hash(val):
+        val = str(val).strip()
+        if not val:
+            return ""
+        return "#{}".format(val)
+    growth = [prepend_hash(gr) for gr in growth]
+
+    # extend growth list to have same length as texts
+    growth = growth + [""]*(len(texts)-len(growth))
+    texts = [" ".join(text) for text in zip(growth, texts)]
+    return separator.join(texts)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import time
+from datetime import timedelta
+
+import transaction
+from Acquisition import aq_base
+from Acquisition import aq_parent
+from bes.lims import logger
+from bes.lims.scripts.utils import load_checkpoint
+from bes.lims.scripts.utils import save_checkpoint
+from bika.lims import api
+
+
+def get_catalogs():
+    """Returns all the catalogs of the site
+    """
+    portal = api.get_portal()
+    catalogs = []
+    for obj in portal.objectValues():
+        if hasattr(aq_base(obj), "_catalog") and \
+                hasattr(aq_base(obj), "uncatalog_object"):
+            catalogs.append(obj)
+    return catalogs
+
+
+def get_catalog_paths(catalog, path):
+    """Returns the paths cataloged in the catalog passed-in that are either
+    the path passed-in or below it, without loading any object
+    """
+    uids = catalog._catalog.uids
+    prefix = "%s/" % path
+    paths = uids.keys(min=path, max="%s\xff" % prefix)
+    return filter(lambda p: p == path or p.startswith(prefix), paths)
+
+
+def uncatalog_tree(path, catalogs):
+    """Removes the path passed-in and all the paths below it from the
+    catalogs, so the contents of the object are unindexed as well. Both the
+    absolute and portal-relative paths are considered (e.g. uid_catalog)
+    """
+    portal_path = api.get_path(api.get_portal())
+    relative = path[len(portal_path) + 1:]
+    for catalog in catalogs:
+        for key in (path, relative):
+            for item in get_catalog_paths(catalog, key):
+                catalog.uncatalog_object(item)
+
+
+def delete_path(portal, path, catalogs, skip=None):
+    """Deletes the object at the given path without firing events, along
+    with its catalog entries and those of its contents. Returns whether the
+    object was deleted
+    """
+    obj = portal.unrestrictedTraverse(path, None)
+    if obj is None or api.get_path(obj) != path:
+        # removed already, remove stale entries only. Traversal might return
+        # another object with same id through acquisition
+        uncatalog_tree(path, catalogs)
+        return False
+
+    if skip and skip(obj):
+        obj._p_deactivate()
+        return False
+
+    uncatalog_tree(path, catalogs)
+    parent = aq_parent(obj)
+    parent._delObject(obj.getId(), suppress_events=True)
+    return True
+
+
+def bulk_delete(query, catalog_id, batch_size=100, dry_run=False,
+                checkpoint_path=None, skip=None):
+    """Deletes the objects that match with the query in the catalog passed-in,
+    committing in batches. Only the paths of the objects are kept in memory,
+    and objects are loaded one by one. The path of the last processed object
+    is stored in the checkpoint file after each commit, so the process
+    resumes from there if interrupted. The callable skip, if set, tells
+    whether an object must be kept. Returns the number of deleted objects,
+    or the number of objects to delete if dry_run
+    """
+    brains = api.search(query, catalog_id)
+    paths = sorted([api.get_path(brain) for brain in brains])
+    del brains
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    last_path = checkpoint.get("last_path")
+    if last_path:
+        logger.info("Resuming after {}".format(last_path))
+        paths = filter(lambda path: path > last_path, paths)
+
+    total = len(paths)
+    if dry_run:
+        logger.info("Objects to delete: {} [DRY RUN]".format(total))
+        return total
+
+    portal = api.get_portal()
+    catalogs = get_catalogs()
+    deleted = checkpoint.get("deleted", 0)
+    started = time.time()
+    for start in range(0, total, batch_size):
+        batch = paths[start:start + batch_size]
+        for path in batch:
+            if delete_path(portal, path, catalogs, skip=skip):
+                deleted += 1
+
+        transaction.commit()
+        checkpoint.update({
+            "last_path": batch[-1],
+            "deleted": deleted,
+        })
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        # throughput and estimated time
+        processed = start + len(batch)
+        rate = processed / max(time.time() - started, 1.0)
+        eta = timedelta(seconds=int((total - processed) / rate))
+        logger.info("Processed: {}/{} ({:.1f}/s), deleted: {}, ETA: {}"
+                    .format(processed, total, rate, deleted, eta))
+
+    return deleted
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import os
+import time
+from datetime import timedelta
+
+import transaction
+from Acquisition import aq_base
+from bes.lims import logger
+from bes.lims.scripts.utils import MAX_COMMIT_ATTEMPTS
+from bika.lims import api
+from ZODB.POSException import ConflictError
+
+# Strategies to decide whether an object has to be indexed in a catalog:
+# - mapped: senaite catalogs, only the objects of the types mapped
+# - find: other CMF catalogs, all objects that can be reindexed
+# - refresh: plain ZCatalogs (e.g. uid_catalog), only the objects that were
+#   cataloged before clearing
+MAPPED = "mapped"
+FIND = "find"
+REFRESH = "refresh"
+
+
+def get_strategy(catalog):
+    """Returns the strategy to rebuild the catalog passed-in
+    """
+    if hasattr(aq_base(catalog), "is_obj_indexable"):
+        return MAPPED
+    if hasattr(aq_base(catalog), "clearFindAndRebuild"):
+        return FIND
+    return REFRESH
+
+
+def split_folders(folders, parts, sizes):
+    """Splits the folders passed-in in the given number of groups, balanced
+    by their sizes, a dict of folder id -> estimated number of objects
+    """
+    def get_size(folder):
+        return sizes.get(api.get_id(folder), 1)
+
+    groups = [[] for num in range(parts)]
+    totals = [0] * parts
+    folders = sorted(folders, key=get_size, reverse=True)
+    for folder in folders:
+        idx = totals.index(min(totals))
+        groups[idx].append(folder)
+        totals[idx] += get_size(folder)
+    return filter(None, groups)
+
+
+def deactivate(obj):
+    """Flushes the object from memory
+    """
+    try:
+        obj._p_deactivate()
+    except AttributeError:
+        pass
+
+
+class CatalogRebuilder(object):
+    """Rebuilds several catalogs with a single walk through the site. Each
+    object is indexed in all the catalogs it belongs to when visited, and
+    changes are committed in batches. Batches are indexed again if the commit
+    fails because of a conflict
+    """
+
+    def __init__(self, catalog_ids, batch_size=1000):
+        self.portal = api.get_portal()
+        self.portal_path = api.get_path(self.portal)
+        self.catalogs = [api.get_tool(cid) for cid in catalog_ids]
+        self.batch_size = batch_size
+        self.strategies = {}
+        self.mapped_types = {}
+        for catalog in self.catalogs:
+            strategy = get_strategy(catalog)
+            self.strategies[catalog.id] = strategy
+            if strategy == MAPPED:
+                self.mapped_types[catalog.id] = catalog.get_mapped_types()
+
+        # paths cataloged before clearing, for the refresh strategy
+        self.paths = {}
+
+        # estimated number of objects of each top-level folder
+        self.sizes = {}
+
+        # paths indexed and refresh paths consumed since last commit
+        self.pending = []
+        self.consumed = []
+
+        # progress
+        self.estimate = 0
+        self.visited = 0
+        self.started = None
+
+    def prepare(self):
+        """Keeps the paths of the catalogs to refresh and the estimated number
+        of objects to visit. Must be called before clearing the catalogs
+        """
+        for catalog in self.catalogs:
+            self.estimate = max(self.estimate, len(catalog))
+            if self.strategies[catalog.id] == REFRESH:
+                self.paths[catalog.id] = set(catalog._catalog.uids.keys())
+
+        for folder in self.portal.objectValues():
+            if api.is_object(folder):
+                self.sizes[api.get_id(folder)] = self.count(folder)
+
+    def count(self, folder):
+        """Returns the estimated number of objects to visit in the folder
+        passed-in, from the number of paths cataloged under it
+        """
+        path = api.get_path(folder)
+        relative = path[len(self.portal_path) + 1:]
+        size = 0
+        for catalog in self.catalogs:
+            uids = catalog._catalog.uids
+            # absolute or portal-relative paths, depending on the catalog
+            paths = [uids.keys(min=key + "/", max=key + "/\xff")
+                     for key in (path, relative)]
+            size = max(size, sum(map(len, paths)))
+        return size + 1
+
+    def save_paths(self, directory):
+        """Writes the paths of the catalogs to refresh to the directory, so
+        they can be loaded by worker processes
+        """
+        for catalog_id, paths in self.paths.items():
+            path = os.path.join(directory, "%s.paths" % catalog_id)
+            with open(path, "w") as f:
+                for item in paths:
+                    f.write("%s\n" % item)
+
+    def load_paths(self, directory):
+        """Loads the paths of the catalogs to refresh from the directory
+        """
+        for catalog_id, strategy in self.strategies.items():
+            path = os.path.join(directory, "%s.paths" % catalog_id)
+            if strategy != REFRESH or not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                paths = [line.rstrip("\n") for line in f]
+            self.paths[catalog_id] = set(filter(None, paths))
+
+    def clear(self):
+        """Clears all the catalogs and commits, so batches aborted because of
+        conflicts afterwards do not undo the clearing
+        """
+        for catalog in self.catalogs:
+            logger.info("Clearing catalog {} ...".format(catalog.id))
+            catalog.manage_catalogClear()
+        transaction.commit()
+
+    def rebuild(self, folders=None):
+        """Walks through the folders passed-in, all the top-level folders of
+        the site by default, and indexes their objects
+        """
+        self.started = time.time()
+        if folders is None:
+            folders = self.portal.objectValues()
+        for folder in folders:
+            if api.is_object(folder):
+                self.walk(folder)
+        self.commit()
+        self.log_progress()
+
+    def walk(self, obj):
+        """Indexes the object and its contents recursively
+        """
+        self.index(obj)
+        if callable(getattr(aq_base(obj), "objectValues", None)):
+            for child in obj.objectValues():
+                if api.is_object(child):
+                    self.walk(child)
+        deactivate(obj)
+
+    def index(self, obj):
+        """Indexes the object in the catalogs it belongs to
+        """
+        path = "/".join(obj.getPhysicalPath())
+        self.index_all(obj, path)
+        self.pending.append(path)
+
+        self.visited += 1
+        if self.visited % self.batch_size == 0:
+            self.commit()
+            self.log_progress()
+
+    def index_all(self, obj, path):
+        """Indexes the object in all the catalogs
+        """
+        portal_type = api.get_portal_type(obj)
+        for catalog in self.catalogs:
+            try:
+                self.index_in(catalog, obj, path, portal_type)
+            except TypeError:
+                # catalogs have 'indexObject' as well, but they take
+                # different args, and will fail
+                pass
+
+    def commit(self):
+        """Commits the objects indexed since the last commit. On conflicts,
+        the transaction is aborted and these objects are indexed again
+        """
+        for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+            try:
+                transaction.commit()
+                break
+            except ConflictError:
+                transaction.abort()
+                if attempt == MAX_COMMIT_ATTEMPTS:
+                    raise
+                logger.warn("Conflict while committing, retrying batch ...")
+                self.reindex_pending()
+        self.pending = []
+        self.consumed = []
+
+    def reindex_pending(self):
+        """Indexes again the objects indexed since the last commit
+        """
+        for catalog_id, key in self.consumed:
+            self.paths[catalog_id].add(key)
+        self.consumed = []
+        for path in self.pending:
+            obj = self.portal.unrestrictedTraverse(path, None)
+            if obj is None or api.get_path(obj) != path:
+                # removed meanwhile
+                continue
+            self.index_all(obj, path)
+            deactivate(obj)
+
+    def index_in(self, catalog, obj, path, portal_type):
+        """Indexes the object in the catalog passed-in, if it belongs to it
+        """
+        strategy = self.strategies[catalog.id]
+        if strategy == MAPPED:
+            if not catalog.supports_indexing(obj):
+                return
+            mapped_types = self.mapped_types[catalog.id]
+            if catalog.is_obj_indexable(obj, portal_type, mapped_types):
+                catalog._reindexObject(obj)
+
+        elif strategy == FIND:
+            if callable(getattr(aq_base(obj), "reindexObject", None)):
+                catalog._reindexObject(obj)
+
+        else:
+            # absolute or portal-relative paths, depending on the catalog
+            paths = self.paths.get(catalog.id, set())
+            relative = path[len(self.portal_path) + 1:]
+            for key in (path, relative):
+                if key in paths:
+                    catalog.catalog_object(obj, key)
+                    paths.discard(key)
+                    self.consumed.append((catalog.id, key))
+                    break
+
+    def refresh_leftovers(self):
+        """Catalogs the objects that were cataloged before clearing in the
+        catalogs to refresh, but not visited (e.g. not contained in folders)
+        """
+        for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+            for catalog_id, paths in self.paths.items():
+                catalog = api.get_tool(catalog_id)
+                leftovers = filter(lambda p: catalog.getrid(p) is None, paths)
+                logger.info("Refreshing {} leftovers in {} ...".format(
+                    len(leftovers), catalog_id))
+                for path in leftovers:
+                    obj = catalog.resolve_path(path)
+                    if obj is None:
+                        continue
+                    catalog.catalog_object(obj, path)
+                    deactivate(obj)
+            try:
+                transaction.commit()
+                return
+            except ConflictError:
+                transaction.abort()
+                if attempt == MAX_COMMIT_ATTEMPTS:
+                    raise
+                logger.warn("Conflict while committing, retrying ...")
+
+    def log_progress(self):
+        """Logs the number of objects visited, the rate and estimated time
+        """
+        elapsed = max(time.time() - self.started, 1.0)
+        rate = self.visited / elapsed
+        remaining = max(self.estimate - self.visited, 0)
+        eta = timedelta(seconds=int(remaining / rate)) if rate else "?"
+        logger.info("Objects visited: {} ({:.1f}/s), ETA: {}".format(
+            self.visited, rate, eta))
+
+
+def rebuild_catalogs(catalog_ids, batch_size=1000):
+    """Clears and rebuilds the catalogs passed-in with a single walk through
+    the site, committing in batches
+    """
+    logger.info("Rebuilding catalogs {} ...".format(", ".join(catalog_ids)))
+    rebuilder = CatalogRebuilder(catalog_ids, batch_size=batch_size)
+    rebuilder.prepare()
+    rebuilder.clear()
+    rebuilder.rebuild()
+    rebuilder.refresh_leftovers()
+    logger.info("Rebuilding catalogs [DONE]")
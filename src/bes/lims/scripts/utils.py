@@ -18,9 +18,17 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+import json
+import os
+
 import six
+import transaction
 from bika.lims import api
 from bes.lims import logger
+from ZODB.POSException import ConflictError
+
+# Max number of attempts to commit a batch when conflicts occur
+MAX_COMMIT_ATTEMPTS = 3
 
 
 def clear_and_rebuild(catalog_id_or_ids):
@@ -39,3 +47,100 @@ def clear_and_rebuild(catalog_id_or_ids):
         else:
             logger.warn("Cannot clear and rebuild {}".format(catalog.id))
         logger.info("Clearing and rebuilding {} [DONE]".format(catalog_id))
+
+
+def get_partition(brains, parts, part):
+    """Returns the brains of the partition passed-in (0-based), sorted by
+    path. Partitions are contiguous ranges of paths, so objects from same
+    container are processed by same database client
+    """
+    brains = sorted(brains, key=lambda brain: brain.getPath())
+    if parts <= 1:
+        return brains
+    size = len(brains)
+    start = size * part // parts
+    end = size * (part + 1) // parts
+    return brains[start:end]
+
+
+def load_checkpoint(path):
+    """Returns the checkpoint stored in the file passed-in, or an empty dict
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    """Stores the checkpoint in the file passed-in
+    """
+    if not path:
+        return
+    tmp_path = "%s.tmp" % path
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    # rename is atomic, the checkpoint is never left half-written
+    os.rename(tmp_path, path)
+
+
+def reindex_batch(catalog, brains, idxs, update_metadata=False):
+    """Reindexes the indexes passed-in for the brains and commits. The batch
+    is processed again if the commit fails because of a conflict
+    """
+    for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+        for brain in brains:
+            obj = api.get_object(brain, default=None)
+            if obj is None:
+                continue
+            catalog.catalog_object(obj, uid=brain.getPath(), idxs=idxs,
+                                   update_metadata=update_metadata)
+            obj._p_deactivate()
+        try:
+            transaction.commit()
+            return
+        except ConflictError:
+            transaction.abort()
+            if attempt == MAX_COMMIT_ATTEMPTS:
+                raise
+            logger.warn("Conflict while committing, retrying batch ...")
+
+
+def reindex_indexes(catalog_id, idxs, brains, update_metadata=False,
+                    batch_size=500, checkpoint_path=None):
+    """Reindexes only the indexes passed-in for the brains, sorted by path,
+    committing in batches. Metadata is updated only if update_metadata. The
+    path of the last processed brain is stored in the checkpoint file after
+    each commit, so the process resumes from there if interrupted
+    """
+    catalog = api.get_tool(catalog_id)
+    missing = filter(lambda idx: idx not in catalog.indexes(), idxs)
+    if missing:
+        raise ValueError("Indexes not found in {}: {}".format(
+            catalog_id, ", ".join(missing)))
+
+    brains = sorted(brains, key=lambda brain: brain.getPath())
+    checkpoint = load_checkpoint(checkpoint_path)
+    last_path = checkpoint.get("last_path")
+    if last_path:
+        logger.info("Resuming after {}".format(last_path))
+        brains = filter(lambda brain: brain.getPath() > last_path, brains)
+
+    total = len(brains)
+    logger.info("Reindexing {} in {} for {} objects ...".format(
+        ", ".join(idxs), catalog_id, total))
+
+    for start in range(0, total, batch_size):
+        batch = brains[start:start + batch_size]
+        reindex_batch(catalog, batch, idxs, update_metadata=update_metadata)
+
+        processed = start + len(batch)
+        checkpoint.update({
+            "last_path": batch[-1].getPath(),
+            "processed": checkpoint.get("processed", 0) + len(batch),
+        })
+        save_checkpoint(checkpoint_path, checkpoint)
+        logger.info("Reindexed objects: {}/{}".format(processed, total))
+
+    logger.info("Reindexing {} in {} [DONE]".format(", ".join(idxs),
+                                                   catalog_id))
@@ -45,11 +45,13 @@ INDEXES = [
     # Tuples of (catalog, index_name, index_attribute, index_type)
     (ANALYSIS_CATALOG, "department_uid", "", "FieldIndex"),
     (ANALYSIS_CATALOG, "date_verified", "", "DateIndex"),
+    (ANALYSIS_CATALOG, "date_changed", "", "DateIndex"),
     (SAMPLE_CATALOG, "department_uid", "", "KeywordIndex"),
 ]
 
 COLUMNS = [
     # Tuples of (catalog, column_name)
+    (ANALYSIS_CATALOG, "report_hidden"),
 ]
 
 # Tuples of (portal_type, list of behaviors)
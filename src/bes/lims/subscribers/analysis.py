@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from bes.lims.utils import update_sample_departments
+from bika.lims.interfaces import IAnalysisRequest
+
+
+def ObjectModifiedEventHandler(analysis, event):  # noqa camelcase
+    """Actions to be done when an analysis is created or its fields are
+    modified afterwards
+    """
+    sample = analysis.getRequest()
+    if IAnalysisRequest.providedBy(sample):
+        # Keep the departments of the sample up-to-date
+        update_sample_departments(sample, analysis)
+
+
+def ObjectRemovedEventHandler(analysis, event):  # noqa camelcase
+    """Actions to be done when an analysis is removed
+    """
+    if event.object is not analysis:
+        # the whole sample (or container) is being removed
+        return
+
+    sample = event.oldParent
+    if IAnalysisRequest.providedBy(sample):
+        # Keep the departments of the sample up-to-date
+        update_sample_departments(sample, analysis, removed=True)
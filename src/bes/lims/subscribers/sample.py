@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from bes.lims.utils import reindex_date_changed
+from Products.Archetypes.interfaces import IObjectInitializedEvent
+
+
+def ObjectModifiedEventHandler(sample, event):  # noqa camelcase
+    """Actions to be done when a sample is modified
+    """
+    if IObjectInitializedEvent.providedBy(event):
+        # the sample has just been created
+        return
+
+    # Keep track of the last change of analyses for incremental exports
+    reindex_date_changed(sample)
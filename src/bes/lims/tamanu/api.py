@@ -18,11 +18,17 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+import copy
+
+from BTrees.OOBTree import OOBTree
 from bika.lims import api
 from bes.lims.tamanu import logger
+from bes.lims.tamanu.config import TAMANU_RECORD_FIELDS
 from bes.lims.tamanu.config import TAMANU_STORAGE
+from bes.lims.tamanu.config import TAMANU_UIDS_STORAGE
 from bes.lims.tamanu.interfaces import ITamanuContent
 from bes.lims.tamanu.interfaces import ITamanuResource
+from bes.lims.tamanu.payload import TamanuPayload
 from persistent.dict import PersistentDict
 from Products.Archetypes.utils import getRelURL
 from senaite.core.api import dtime
@@ -59,13 +65,75 @@ def get_tamanu_storage(obj):
     return annotation[TAMANU_STORAGE]
 
 
+def get_tamanu_record(obj):
+    """Returns a dict with the fields of the original Tamanu resource the
+    object was built from that are kept inline (see TAMANU_RECORD_FIELDS),
+    along with its meta lastUpdated, without loading the whole data
+    """
+    if not is_tamanu_content(obj):
+        return {}
+    storage = IAnnotations(obj).get(TAMANU_STORAGE) or {}
+    record = storage.get("record")
+    if record is None:
+        # BBB data stored inline, before the payload was kept apart
+        record = to_tamanu_record(storage.get("data") or {})
+    return copy.deepcopy(record)
+
+
+def get_tamanu_data(obj):
+    """Returns the whole data of the original Tamanu resource the object was
+    built from. Loads and decompresses the stored payload, so use
+    get_tamanu_record instead when possible
+    """
+    if not is_tamanu_content(obj):
+        return {}
+    storage = IAnnotations(obj).get(TAMANU_STORAGE) or {}
+    payload = storage.get("payload")
+    if payload is not None:
+        return payload.get()
+    # BBB data stored inline, before the payload was kept apart
+    return copy.deepcopy(storage.get("data") or {})
+
+
+def set_tamanu_data(obj, data):
+    """Stores the data of the original Tamanu resource the object is built
+    from. The whole data is kept compressed in a record of its own, while the
+    fields used the most are kept inline
+    """
+    storage = get_tamanu_storage(obj)
+    payload = storage.get("payload")
+    if payload is None:
+        storage["payload"] = TamanuPayload(data)
+    else:
+        payload.set(data)
+    storage["record"] = to_tamanu_record(data)
+
+    # BBB data stored inline, before the payload was kept apart
+    if "data" in storage:
+        del storage["data"]
+
+
+def to_tamanu_record(data):
+    """Returns a dict with the fields from the Tamanu data passed-in that are
+    kept inline in the storage of objects, along with its meta lastUpdated.
+    Returns an empty dict if no data
+    """
+    if not data:
+        return {}
+    record = dict([(key, copy.deepcopy(data[key]))
+                   for key in TAMANU_RECORD_FIELDS if key in data])
+    record["meta"] = {"lastUpdated": get_last_updated(data)}
+    return record
+
+
 def get_tamanu_uid(obj):
     """Returns the UID of the counterpart content at Tamanu, if any
     """
     if is_tamanu_resource(obj):
         return obj.UID
     if is_tamanu_content(obj):
-        storage = get_tamanu_storage(obj)
+        # do not create the storage, this is called on indexing
+        storage = IAnnotations(obj).get(TAMANU_STORAGE) or {}
         return storage.get("uid", None)
     return None
 
@@ -104,10 +172,8 @@ def get_tamanu_modified(obj):
         meta = obj.get("meta") or {}
         modified = meta.get("lastUpdated")
     if is_tamanu_content(obj):
-        storage = get_tamanu_storage(obj)
-        data = storage.get("data")
-        meta = data.get("meta") or {}
-        modified = meta.get("lastUpdated")
+        record = get_tamanu_record(obj)
+        modified = get_last_updated(record)
     return dtime.to_dt(modified)
 
 
@@ -135,41 +201,137 @@ def get_tamanu_session_for(obj, login=True):
     return None
 
 
+def get_tamanu_uids_storage(create=False):
+    """Returns the OOBTree that maps the Tamanu UIDs with the objects linked
+    to them. Values are (target_uid, ((uid, status), ...)) tuples, where
+    target_uid is the UID of the object the Tamanu UID resolves to. Returns
+    None if the storage does not exist yet, unless create is True
+    """
+    portal = api.get_portal()
+    annotation = IAnnotations(portal)
+    storage = annotation.get(TAMANU_UIDS_STORAGE)
+    if storage is None and create:
+        storage = OOBTree()
+        annotation[TAMANU_UIDS_STORAGE] = storage
+    return storage
+
+
+def get_target_uid(records):
+    """Returns the UID of the object a Tamanu UID resolves to from the list of
+    (uid, status) tuples of the objects linked to it
+    """
+    if not records:
+        return None
+
+    # TODO Consider to remove this, as it was added because of a manual and
+    #      not documented modification found at Nauru's P-System
+    # give priority to published samples first
+    published = [uid for uid, status in records if status == "published"]
+    if published:
+        return published[-1]
+
+    # non-cancelled next
+    valid = [uid for uid, status in records if status not in ["cancelled"]]
+    if valid:
+        return valid[-1]
+
+    # all cancelled, return last
+    return records[-1][0]
+
+
+def set_tamanu_uid_records(tamanu_uid, records):
+    """Stores the (uid, status) records of the objects linked to the given
+    Tamanu UID, along with the UID of the object it resolves to
+    """
+    storage = get_tamanu_uids_storage(create=True)
+    records = tuple(records)
+    if not records:
+        if tamanu_uid in storage:
+            del storage[tamanu_uid]
+        return
+
+    value = (get_target_uid(records), records)
+    if storage.get(tamanu_uid) != value:
+        storage[tamanu_uid] = value
+
+
+def get_tamanu_uid_records(tamanu_uid):
+    """Returns the (uid, status) records of the objects linked to the given
+    Tamanu UID
+    """
+    storage = get_tamanu_uids_storage() or {}
+    target, records = storage.get(tamanu_uid, (None, ()))
+    return records
+
+
+def index_tamanu_uid(obj, tamanu_uid=None):
+    """Adds or updates the object in the Tamanu UIDs mapping, so its current
+    status is considered when resolving the Tamanu UID
+    """
+    tamanu_uid = tamanu_uid or get_tamanu_uid(obj)
+    if not tamanu_uid:
+        return
+
+    uid = api.get_uid(obj)
+    status = api.get_review_status(obj)
+    records = get_tamanu_uid_records(tamanu_uid)
+
+    # discard the records of the objects that do not exist anymore (e.g.
+    # removed without notification by a bulk deletion)
+    records = [record for record in records
+               if record[0] == uid or api.get_brain_by_uid(record[0])]
+    uids = [record[0] for record in records]
+    if uid in uids:
+        records[uids.index(uid)] = (uid, status)
+    else:
+        records.append((uid, status))
+    set_tamanu_uid_records(tamanu_uid, records)
+
+
+def unindex_tamanu_uid(obj, tamanu_uid=None):
+    """Removes the object from the Tamanu UIDs mapping
+    """
+    tamanu_uid = tamanu_uid or get_tamanu_uid(obj)
+    if not tamanu_uid:
+        return
+
+    uid = api.get_uid(obj)
+    records = get_tamanu_uid_records(tamanu_uid)
+    records = filter(lambda record: record[0] != uid, records)
+    set_tamanu_uid_records(tamanu_uid, records)
+
+
+def get_uid_by_tamanu_uid(uid, default=None):
+    """Returns the UID of the object for the given Tamanu UID, without
+    querying the catalogs
+    """
+    if not uid:
+        return default
+    storage = get_tamanu_uids_storage() or {}
+    target, records = storage.get(uid, (None, ()))
+    return target or default
+
+
 def get_brain_by_tamanu_uid(uid, default=None):
     """Query a brain by a given Tamanu UID
     """
-    if not uid:
+    target = get_uid_by_tamanu_uid(uid)
+    if not target:
         return default
 
-    uc = api.get_tool(api.UID_CATALOG)
-    brains = uc(tamanu_uid=uid)
-
-    if len(brains) == 1:
-        return brains[0]
-
-    elif len(brains) > 1:
-        # TODO Consider to remove this, as it was added because of a manual and
-        #      not documented modification found at Nauru's P-System
-        # group by status
-        target = None
-        by_status = dict()
-        for brain in brains:
-            obj = api.get_object(brain)
-            status = api.get_review_status(obj)
-            by_status.setdefault(status, []).append(brain)
-            if status not in ["cancelled"]:
-                target = brain
-
-        # give priority to published samples first
-        published = by_status.get("published")
-        target = published[-1] if published else target
-
-        # if no target (all cancelled), return last brain
-        return target if target else brains[-1]
-
-    if len(brains) != 1:
+    brain = api.get_brain_by_uid(target)
+    if brain:
+        return brain
+
+    # the object was removed without notification (e.g. bulk deletion).
+    # Resolve from the records of the objects that still exist, the mapping
+    # is cleaned up next time an object is linked to this Tamanu UID
+    records = get_tamanu_uid_records(uid)
+    records = filter(lambda record: api.get_brain_by_uid(record[0]), records)
+    target = get_target_uid(records)
+    if not target:
         return default
-    return brains[0]
+    return api.get_brain_by_uid(target, default=default)
 
 
 def get_object_by_tamanu_uid(uid, default=_marker):
@@ -260,27 +422,71 @@ def create_object(container, resource, portal_type, **kwargs):
 
 
 def link_tamanu_resource(obj, resource):
-    """Assigns the tamanu uid to the given object
+    """Assigns the tamanu uid to the given object. Only the indexes affected
+    by the link are reindexed and the data of the resource is only stored
+    when modified at Tamanu since the last link
     """
     if not is_tamanu_resource(resource):
         raise ValueError("Type not supported: {}".format(repr(type(resource))))
 
     # mark the object with ITamanuContent, so we can always know before hand
     # if this object has a counterpart resource at Tamanu
-    alsoProvides(obj, ITamanuContent)
+    marked = is_tamanu_content(obj)
+    if not marked:
+        alsoProvides(obj, ITamanuContent)
 
     # assign the tamanu uid, along with current data so we can always use
     # the original information, even when connection with Tamanu is lost
     annotation = get_tamanu_storage(obj)
-    annotation["uid"] = resource.UID
-    annotation["data"] = resource.to_dict()
+    previous = annotation.get("uid")
+    if previous != resource.UID:
+        annotation["uid"] = resource.UID
+
+    # do not write the data unless changed, to keep transactions small
+    if is_data_outdated(obj, resource):
+        set_tamanu_data(obj, resource.to_dict())
+
+    # keep the Tamanu UIDs mapping up-to-date
+    if previous and previous != resource.UID:
+        unindex_tamanu_uid(obj, previous)
+    index_tamanu_uid(obj, resource.UID)
+
+    # reindex object_provides in registered catalogs
+    if not marked:
+        obj.reindexObject(idxs=["object_provides"])
 
     # index tamanu_uid from uid_catalog
-    catalog_object(obj)
+    if previous != resource.UID:
+        catalog_object(obj, idxs=["tamanu_uid"])
+
+
+def get_last_updated(data):
+    """Returns the lastUpdated value from the meta of the Tamanu data passed-in
+    """
+    meta = data.get("meta") or {}
+    return meta.get("lastUpdated")
 
 
-def catalog_object(obj):
-    """Catalog the object in all registered catalogs
+def is_data_outdated(obj, resource):
+    """Returns whether the Tamanu data stored for the object differs from the
+    data of the resource. The lastUpdated values are compared when available,
+    so the whole data is only loaded for resources without meta information
+    """
+    record = get_tamanu_record(obj)
+    if not record:
+        return True
+
+    meta = resource.get_raw("meta") or {}
+    last_updated = meta.get("lastUpdated")
+    if last_updated:
+        return get_last_updated(record) != last_updated
+
+    return get_tamanu_data(obj) != dict(resource.items())
+
+
+def catalog_object(obj, idxs=None):
+    """Catalog the object in all registered catalogs. If idxs is set, only
+    these indexes from uid_catalog are updated
     """
     uid_catalog = api.get_tool(UID_CATALOG)
     if api.is_at_content(obj):
@@ -292,6 +498,11 @@ def catalog_object(obj):
         # see plone.app.referencablebehavior.uidcatalog
         url = "/".join(obj.getPhysicalPath())
 
+    if idxs:
+        # update the given indexes only
+        uid_catalog.catalog_object(obj, url, idxs=idxs, update_metadata=0)
+        return
+
     # explicitly catalog in uid_catalog
     uid_catalog.catalog_object(obj, url)
 
@@ -27,7 +27,6 @@ class MetaView(BrowserView):
 
     def __call__(self):
         if tapi.is_tamanu_content(self.context):
-            meta = tapi.get_tamanu_storage(self.context)
-            data = dict(meta).get("data")
+            data = tapi.get_tamanu_data(self.context)
             return json.dumps(data)
         return "No metadata"
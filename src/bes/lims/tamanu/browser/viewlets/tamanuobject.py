@@ -41,7 +41,7 @@ class TamanuObjectViewlet(ViewletBase):
         current context was built from on import, if any
         """
         if tapi.is_tamanu_content(self.context):
-            return tapi.get_tamanu_storage(self.context)
+            return tapi.get_tamanu_record(self.context)
         return None
 
     def get_tamanu_metadata_url(self):
@@ -78,8 +78,7 @@ class TamanuObjectViewlet(ViewletBase):
 
         # check analyses
         missing = []
-        data = meta.get("data") or {}
-        details = data.get("orderDetail")
+        details = meta.get("orderDetail")
         for coding in self.get_codings(details, SENAITE_TESTS_CODING_SYSTEM):
             # search by keyword
             code = coding.get("code")
@@ -107,8 +106,7 @@ class TamanuObjectViewlet(ViewletBase):
             terms[api.get_title(profile)] = True
 
         missing = []
-        data = meta.get("data") or {}
-        profile = data.get("code")
+        profile = meta.get("code")
         for item in self.get_codings(profile, SENAITE_PROFILES_CODING_SYSTEM):
             # search by profile key
             code = item.get("code")
@@ -22,6 +22,16 @@ TAMANU_USER = "tamanu"
 
 TAMANU_STORAGE = "senaite.tamanu.storage"
 
+TAMANU_UIDS_STORAGE = "senaite.tamanu.uids.storage"
+
+# Fields of the original Tamanu resource that are kept inline in the storage
+# of the object, so they can be read without loading the whole resource data
+TAMANU_RECORD_FIELDS = (
+    "code",
+    "subject",
+    "orderDetail",
+)
+
 TAMANU_TASKS_QUEUE = "senaite.tamanu.queue.storage"
 
 TAMANU_QUARANTINE_QUEUE = "senaite.tamanu.quarantine.storage"
@@ -81,8 +81,7 @@ def send_rejection_report(sample, report):
     report_uuid = str(tapi.get_uuid(report))
 
     # get the original data
-    meta = tapi.get_tamanu_storage(sample)
-    data = meta.get("data") or {}
+    data = tapi.get_tamanu_record(sample)
 
     # modification date
     modified = api.get_creation_date(sample)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import json
+import zlib
+
+from persistent import Persistent
+
+
+class TamanuPayload(Persistent):
+    """Persistent record that keeps the original data of a Tamanu resource as
+    compressed JSON. Being a record on its own, the data is only loaded from
+    the database when requested, and not when the annotations of the object
+    it belongs to are accessed
+    """
+
+    def __init__(self, data):
+        self.last_updated = None
+        self._data = None
+        self.set(data)
+
+    def set(self, data):
+        """Stores the data passed-in, along with its lastUpdated value
+        """
+        meta = data.get("meta") or {}
+        self.last_updated = meta.get("lastUpdated")
+        dumped = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        self._data = zlib.compress(dumped)
+
+    def get(self):
+        """Returns the stored data as a dict
+        """
+        return json.loads(zlib.decompress(self._data))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of BES.LIMS.
+#
+# BES.LIMS is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2024-2025 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from bes.lims.tamanu import api as tapi
+
+
+def on_after_transition(obj, event):
+    """Updates the status of the object in the Tamanu UIDs mapping, so the
+    counterpart of the Tamanu resource is resolved without waking up objects
+    """
+    if not event.transition:
+        return
+    tapi.index_tamanu_uid(obj)
+
+
+def on_object_removed(obj, event):
+    """Removes the object from the Tamanu UIDs mapping
+    """
+    tapi.unindex_tamanu_uid(obj)
@@ -3,6 +3,7 @@
 import copy
 import uuid
 
+from bes.lims.resultoptions import format_result
 from bes.lims.tamanu import api as tapi
 from bes.lims.tamanu import logger
 from bes.lims.tamanu.config import ANALYSIS_STATUSES
@@ -15,7 +16,7 @@ from bes.lims.tamanu.config import SNOMED_CODING_SYSTEM
 from bes.lims.tamanu.interfaces import ITamanuTask
 from bes.lims.tamanu.tasks import NOTIFY_DIAGNOSTIC_REPORT
 from bes.lims.tamanu.tasks import queue
-from bes.lims.utils import is_reportable
+from bes.lims.utils import ReportableEvaluator
 from bika.lims import api
 from bika.lims.interfaces import IAnalysisRequest
 from bika.lims.utils import tmpID
@@ -140,8 +141,7 @@ class NotifyAdapter(object):
         report_uuid = str(report_uuid)
 
         # get the original data
-        meta = tapi.get_tamanu_storage(sample)
-        data = meta.get("data") or {}
+        data = tapi.get_tamanu_record(sample)
 
         # modification date
         modified = api.get_modification_date(sample)
@@ -248,16 +248,19 @@ class NotifyAdapter(object):
         """
         # add the observations (analyses included in the results report)
         observations = []
-        for analysis in sample.getAnalyses(full_objects=True):
-            if not is_reportable(analysis):
+        is_reportable = ReportableEvaluator()
+        for brain in sample.getAnalyses():
+            if not is_reportable(brain):
                 # skip non-reportable samples
                 continue
 
             # only report analyses that are either verified or published
-            status = api.get_review_status(analysis)
+            status = api.get_review_status(brain)
             if status not in ["verified", "published"]:
                 continue
 
+            analysis = api.get_object(brain)
+
             # get the representation of the analysis as a FHIR Observation
             observation = self.get_observation(analysis)
             # append the observations
@@ -338,7 +341,11 @@ class NotifyAdapter(object):
         if analysis.getExcludeFromIntegration():
             return {"valueString": "Refer to PDF report"}
 
-        result = analysis.getFormattedResult(html=False)
+        # resistance and identification results are formatted as displayed
+        # in the results report
+        result = format_result(analysis, separator="; ")
+        if result is None:
+            result = analysis.getFormattedResult(html=False)
         if not self.is_quantitative(analysis):
             return {"valueString": result}
 
@@ -374,11 +381,10 @@ class NotifyAdapter(object):
         """
         # get the original ServiceRequest FHIR resource dict
         sample = analysis.getRequest()
-        meta = tapi.get_tamanu_storage(sample)
+        data = tapi.get_tamanu_record(sample)
 
         # group the tests by code
         tests = dict()
-        data = meta.get("data") or {}
         for order_detail in data.get("orderDetail", []):
             test = tapi.get_codings(order_detail, SENAITE_TESTS_CODING_SYSTEM)
             code = test[0].get("code") if test else None
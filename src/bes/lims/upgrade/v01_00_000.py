@@ -18,13 +18,13 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
-import copy
 import transaction
 from bes.lims.setuphandlers import setup_ast_integration
 
 from BTrees.OOBTree import OOBTree
 from bes.lims import PRODUCT_NAME as product
 from bes.lims import logger
+from bes.lims.config import ANALYSIS_REPORTABLE_STATUSES
 from bes.lims.setuphandlers import setup_behaviors
 from bes.lims.setuphandlers import setup_catalogs
 from bes.lims.setuphandlers import setup_groups
@@ -33,6 +33,7 @@ from bes.lims.setuphandlers import setup_roles
 from bes.lims.setuphandlers import setup_workflows
 from bes.lims.setuphandlers import WORKFLOWS_TO_UPDATE
 from bes.lims.tamanu import api as tapi
+from bes.lims.tamanu.config import TAMANU_STORAGE
 from bes.lims.tamanu.config import TAMANU_TASKS_QUEUE
 from bes.lims.tamanu.interfaces import ITamanuContent
 from bika.lims import api
@@ -412,9 +413,8 @@ def reset_tamanu_ids_for(uids):
             # BBB (for earlier records from palau.lims)
             alsoProvides(ITamanuContent)
 
-        # get the tamanu-related storage
-        storage = tapi.get_tamanu_storage(sample)
-        item = copy.deepcopy(storage.get("data", {}))
+        # get the tamanu-related data
+        item = tapi.get_tamanu_data(sample)
         if not item:
             logger.warn("[SKIP] No Tamanu data found for %r" % sample)
             continue
@@ -628,3 +628,140 @@ def set_site_from_samplepoint(tool):
 def step_ast_integration(tool):
     portal = tool.aq_inner.aq_parent
     setup_ast_integration(portal)
+
+
+def setup_report_jobs_action(tool):
+    """Adds the action for the reports generated in background
+    """
+    logger.info("Setup My reports action ...")
+    portal = tool.aq_inner.aq_parent
+    setup = portal.portal_setup
+    setup.runImportStepFromProfile(profile, "actions")
+    logger.info("Setup My reports action [DONE]")
+
+
+def setup_analyses_change_feed(tool):
+    """Adds the index for the last change of analyses
+    """
+    logger.info("Setup index for the last change of analyses ...")
+    portal = tool.aq_inner.aq_parent
+
+    # Setup Catalogs
+    setup_catalogs(portal)
+
+    logger.info("Setup index for the last change of analyses [DONE]")
+
+
+def setup_report_hidden_metadata(tool):
+    """Adds the metadata column that tells whether analyses are displayed in
+    results reports and fills it for the analyses in a reportable status
+    """
+    logger.info("Setup report_hidden metadata for analyses ...")
+    portal = tool.aq_inner.aq_parent
+
+    # Setup Catalogs
+    setup_catalogs(portal)
+
+    # Fill the metadata of the analyses that can be reported
+    query = {
+        "portal_type": "Analysis",
+        "review_state": ANALYSIS_REPORTABLE_STATUSES,
+    }
+    brains = api.search(query, ANALYSIS_CATALOG)
+    uids = [api.get_uid(brain) for brain in brains]
+
+    # process them in chunks
+    size = 500
+    for num, chunk in enumerate(to_chunks(uids, size)):
+        update_report_hidden_metadata_for(chunk)
+        processed = (num * size) + len(chunk)
+        logger.info("Processed objects: %s/%s" % (processed, len(uids)))
+
+    logger.info("Setup report_hidden metadata for analyses [DONE]")
+
+
+def update_report_hidden_metadata_for(uids):
+    cat = api.get_tool(ANALYSIS_CATALOG)
+    for uid in uids:
+        analysis = api.get_object_by_uid(uid, default=None)
+        if not analysis:
+            continue
+
+        # only the metadata needs to be updated
+        cat.reindexObject(analysis, idxs=["UID"], update_metadata=1)
+
+        # flush from memory
+        analysis._p_deactivate()
+
+    transaction.commit()
+
+
+def setup_tamanu_uids_mapping(tool):
+    """Fills the mapping between the Tamanu UIDs and the UIDs of the objects
+    linked to them, so counterparts are resolved without catalog queries
+    """
+    logger.info("Setup Tamanu UIDs mapping ...")
+    uc = api.get_tool(api.UID_CATALOG)
+    index = uc._catalog.getIndex("tamanu_uid")
+    tamanu_uids = filter(None, index.uniqueValues())
+
+    # process them in chunks
+    size = 500
+    for num, chunk in enumerate(to_chunks(tamanu_uids, size)):
+        setup_tamanu_uids_mapping_for(chunk)
+        processed = (num * size) + len(chunk)
+        logger.info("Processed objects: %s/%s" % (processed, len(tamanu_uids)))
+
+    logger.info("Setup Tamanu UIDs mapping [DONE]")
+
+
+def setup_tamanu_uids_mapping_for(tamanu_uids):
+    uc = api.get_tool(api.UID_CATALOG)
+    for tamanu_uid in tamanu_uids:
+        for brain in uc(tamanu_uid=tamanu_uid):
+            obj = api.get_object(brain)
+            tapi.index_tamanu_uid(obj, tamanu_uid)
+
+            # flush from memory
+            obj._p_deactivate()
+
+    transaction.commit()
+
+
+def migrate_tamanu_payloads(tool):
+    """Moves the original data of Tamanu resources from the storage of the
+    objects to compressed records of their own, keeping inline only the
+    fields that are used the most
+    """
+    logger.info("Migrate Tamanu payloads ...")
+    storage = tapi.get_tamanu_uids_storage() or {}
+    uids = set()
+    for target, records in storage.values():
+        uids.update([record[0] for record in records])
+    uids = list(uids)
+
+    # process them in chunks
+    size = 500
+    for num, chunk in enumerate(to_chunks(uids, size)):
+        migrate_tamanu_payloads_for(chunk)
+        processed = (num * size) + len(chunk)
+        logger.info("Processed objects: %s/%s" % (processed, len(uids)))
+
+    logger.info("Migrate Tamanu payloads [DONE]")
+
+
+def migrate_tamanu_payloads_for(uids):
+    for uid in uids:
+        obj = api.get_object_by_uid(uid, default=None)
+        if not obj:
+            continue
+
+        storage = IAnnotations(obj).get(TAMANU_STORAGE) or {}
+        data = storage.get("data")
+        if data is not None:
+            tapi.set_tamanu_data(obj, dict(data))
+
+        # flush from memory
+        obj._p_deactivate()
+
+    transaction.commit()
@@ -20,15 +20,20 @@
 
 import csv
 import os
+from bes.lims.config import ANALYSIS_DETACHED_STATUSES
 from bes.lims.config import ANALYSIS_REPORTABLE_STATUSES
+from bes.lims.config import SAMPLE_DEPARTMENTS_STORAGE
 from bika.lims import api
 from bika.lims.interfaces import IAnalysisRequest
 from bika.lims.interfaces import IInternalUse
+from persistent.mapping import PersistentMapping
 from senaite.ast.config import RESISTANCE_KEY
 from senaite.ast.utils import is_ast_analysis
+from senaite.core.api import dtime
 from senaite.core.api import measure as mapi
 from senaite.core.interfaces import ISampleTemplate
 from senaite.core.interfaces import ISampleType
+from zope.annotation.interfaces import IAnnotations
 
 
 def is_reportable(analysis):
@@ -51,6 +56,28 @@ def is_reportable(analysis):
     return status in ANALYSIS_REPORTABLE_STATUSES
 
 
+class ReportableEvaluator(object):
+    """Tells whether analyses have to be displayed in results reports, as
+    is_reportable does, but from the metadata of the catalog brains when
+    possible
+    """
+
+    def __call__(self, analysis):
+        if not api.is_brain(analysis):
+            return is_reportable(analysis)
+
+        status = analysis.review_state
+        if status not in ANALYSIS_REPORTABLE_STATUSES:
+            return False
+
+        # hidden, for internal use or ast analysis not to be reported
+        hidden = getattr(analysis, "report_hidden", None)
+        if not isinstance(hidden, bool):
+            # metadata not available or visibility set at sample level
+            return is_reportable(api.get_object(analysis))
+        return not hidden
+
+
 def get_previous_status(instance, before=None, default=None):
     """Returns the previous state for the given instance and status from
     review history. If before is None, returns the state of the sample before
@@ -72,6 +99,42 @@ def get_previous_status(instance, before=None, default=None):
     return default
 
 
+def get_date_changed(instance):
+    """Returns the date (as DateTime) of the last change of the instance,
+    either an edition or a workflow transition
+    """
+    dates = [instance.modified()]
+
+    # Get the review history, most recent actions first
+    history = api.get_review_history(instance)
+    if history:
+        dates.append(history[0].get("time"))
+
+    dates = filter(dtime.is_date, dates)
+    return max(map(dtime.to_DT, dates))
+
+
+def get_analysis_date_changed(analysis):
+    """Returns the date (as DateTime) of the last change of the analysis or
+    the sample it belongs to, as the values of the sample are exported along
+    with the analysis
+    """
+    dates = [get_date_changed(analysis)]
+    get_request = getattr(analysis, "getRequest", None)
+    sample = get_request() if callable(get_request) else None
+    if sample:
+        dates.append(get_date_changed(sample))
+    return max(dates)
+
+
+def reindex_date_changed(sample):
+    """Reindexes the date of the last change of the analyses from the sample
+    passed-in, so changes of the sample are considered changes of them
+    """
+    for analysis in sample.objectValues("Analysis"):
+        analysis.reindexObject(idxs=["date_changed"])
+
+
 def get_minimum_volume(obj, default="0 ml"):
     """Returns the minimum volume required for the given object
     """
@@ -190,3 +253,65 @@ def get_laboratory():
     # Fallback to pre core#2810 and core#2821, before the migration to DX
     setup = api.get_setup()
     return setup.laboratory
+
+
+def get_analysis_department(analysis):
+    """Returns the uid of the department the analysis counts for in its
+    sample, or None if no department or the analysis is detached
+    """
+    if api.get_review_status(analysis) in ANALYSIS_DETACHED_STATUSES:
+        return None
+    uid = analysis.getRawDepartment()
+    return uid if api.is_uid(uid) else None
+
+
+def get_departments_storage(sample, create=False):
+    """Returns the mapping of analysis uid -> department uid stored in the
+    sample. If create, the storage is initialized from the analyses of the
+    sample when it does not exist yet. Returns None otherwise
+    """
+    annotations = IAnnotations(sample)
+    storage = annotations.get(SAMPLE_DEPARTMENTS_STORAGE)
+    if storage is None and create:
+        storage = PersistentMapping()
+        for analysis in sample.objectValues(spec="Analysis"):
+            department = get_analysis_department(analysis)
+            if department:
+                storage[api.get_uid(analysis)] = department
+        annotations[SAMPLE_DEPARTMENTS_STORAGE] = storage
+    return storage
+
+
+def get_department_uids(sample):
+    """Returns the set of uids of the departments assigned to the analyses
+    of the sample, from the stored value when available
+    """
+    storage = get_departments_storage(sample)
+    if storage is not None:
+        return set(storage.values())
+
+    # not stored yet, no analysis event for this sample since
+    uids = set()
+    for analysis in sample.objectValues(spec="Analysis"):
+        uids.add(get_analysis_department(analysis))
+    uids.discard(None)
+    return uids
+
+
+def update_sample_departments(sample, analysis, removed=False):
+    """Updates the department of the analysis passed-in stored in the sample.
+    The sample is reindexed only if its set of departments changes
+    """
+    storage = get_departments_storage(sample, create=True)
+    before = set(storage.values())
+
+    uid = api.get_uid(analysis)
+    department = None if removed else get_analysis_department(analysis)
+    if department:
+        if storage.get(uid) != department:
+            storage[uid] = department
+    elif uid in storage:
+        del storage[uid]
+
+    if set(storage.values()) != before:
+        sample.reindexObject(idxs=["department_uid"])
@@ -18,6 +18,7 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from bes.lims.utils import update_sample_departments
 from bes.lims.workflow.analysis import events
 
 
@@ -27,6 +28,14 @@ def AfterTransitionEventHandler(analysis, event):  # noqa camelcase
     if not event.transition:
         return
 
+    # Keep track of the last change for incremental exports
+    analysis.reindexObject(idxs=["date_changed"])
+
+    # Keep the departments of the sample up-to-date
+    sample = analysis.getRequest()
+    if sample:
+        update_sample_departments(sample, analysis)
+
     function_name = "after_{}".format(event.transition.id)
     if hasattr(events, function_name):
         # Call the after_* function from events package
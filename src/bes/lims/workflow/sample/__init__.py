@@ -18,6 +18,7 @@
 # Copyright 2024-2025 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from bes.lims.utils import reindex_date_changed
 from bes.lims.workflow.sample import events
 
 
@@ -27,6 +28,9 @@ def AfterTransitionEventHandler(sample, event):  # noqa camelcase
     if not event.transition:
         return
 
+    # Keep track of the last change of analyses for incremental exports
+    reindex_date_changed(sample)
+
     function_name = "after_{}".format(event.transition.id)
     if hasattr(events, function_name):
         # Call the after_* function from events package